@@ -0,0 +1,98 @@
+import asyncio
+
+from ciphers import encode_text, validate_text, generate_vernam_keys, vernam_bytes
+from streaming import CHUNK_SIZE, make_stream
+
+# payloads up to this size are ciphered right on the event loop, bigger ones go to the executor
+INLINE_LIMIT = 1 << 16
+
+# requests ciphered (or waiting for the executor) at the same time; later ones wait for a free slot
+MAX_CONCURRENCY = 64
+
+
+def cipher_bytes(cipher, data, key=None):
+    # one whole message: Vernam encryption returns (ciphertext, keys), Vernam decryption takes the keys as key
+    if cipher == "vernam-encrypt":
+        keys = generate_vernam_keys(len(data))
+        return vernam_bytes(data, keys), keys
+    if cipher == "vernam-decrypt":
+        return vernam_bytes(data, key)
+    return make_stream(cipher, key).transform(data)
+
+
+class AsyncCipher:
+
+    def __init__(self, max_concurrency=MAX_CONCURRENCY, executor=None, inline_limit=INLINE_LIMIT):
+        # executor None is the event loop's default thread pool
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.executor = executor
+        self.inline_limit = inline_limit
+
+    async def _transform(self, function, *args, size):
+        async with self.semaphore:
+            if size <= self.inline_limit:
+                return function(*args)
+            return await asyncio.get_running_loop().run_in_executor(self.executor, function, *args)
+
+    async def run(self, cipher, text, key=None):
+        # str in, str out; bytes in, bytes out (Vernam keys are always bytes)
+        data = validate_text(encode_text(text) if isinstance(text, str) else text)
+        answer = await self._transform(cipher_bytes, cipher, data, key, size=len(data))
+        if isinstance(text, str):
+            if cipher == "vernam-encrypt":
+                return answer[0].decode('ascii'), answer[1]
+            return answer.decode('ascii')
+        return answer
+
+    async def stream(self, reader, writer, cipher, key, chunk_size=CHUNK_SIZE):
+        # reader needs an async read(n), writer a write() and an async drain() (asyncio streams, AsyncFile);
+        # a slow writer holds back reading through drain()
+        stream = make_stream(cipher, key)
+        processed = 0
+        while True:
+            chunk = await reader.read(chunk_size)
+            if not chunk:
+                return processed
+            validate_text(chunk, processed)
+            writer.write(await self._transform(stream.transform, chunk, size=len(chunk)))
+            await writer.drain()
+            processed += len(chunk)
+
+
+class AsyncFile:
+
+    # a regular file with the blocking calls run in an executor, shaped like asyncio's StreamReader/StreamWriter
+    def __init__(self, path_to_file, mode, executor=None):
+        self.file = open(path_to_file, mode)
+        self.executor = executor
+        self.buffer = []
+
+    async def _call(self, function, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, function, *args)
+
+    async def read(self, count=-1):
+        return await self._call(self.file.read, count)
+
+    def write(self, data):
+        self.buffer.append(data)
+
+    async def drain(self):
+        buffer, self.buffer = self.buffer, []
+        if buffer:
+            await self._call(self.file.writelines, buffer)
+
+    async def close(self):
+        await self.drain()
+        await self._call(self.file.close)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exception):
+        await self.close()
+
+
+async def cipher_file(path_to_file, path_to_save, cipher, key, chunk_size=CHUNK_SIZE, cipher_runner=None):
+    cipher_runner = cipher_runner or AsyncCipher()
+    async with AsyncFile(path_to_file, 'rb') as source, AsyncFile(path_to_save, 'wb') as destination:
+        return await cipher_runner.stream(source, destination, cipher, key, chunk_size)
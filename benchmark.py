@@ -0,0 +1,374 @@
+import argparse
+import concurrent.futures
+import json
+import multiprocessing
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+
+try:
+    import resource
+except ImportError:
+    # Windows: no peak RSS
+    resource = None
+
+from ciphers import alphabet, positions, check_text, caesar_encryption, caesar_decryption, caesar_encryption_bytes, \
+    vigenere_encryption, vigenere_decryption, vigenere_encryption_bytes, vernam_encryption, vernam_decryption, \
+    vernam_bytes, generate_vernam_keys, VernamKeystream, load_numpy
+from frequency import STANDARD_PATH, build_frequencies, build_histogram, frequency_analysis, load_profile
+from keyfile import KeyFileWriter
+from mapped import map_file
+from streaming import make_stream, stream_file
+
+BENCHMARK_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".benchmarks")
+
+SIZES = {"1K": 1 << 10, "64K": 1 << 16, "1M": 1 << 20, "16M": 1 << 24, "256M": 1 << 28, "1G": 1 << 30}
+DEFAULT_SIZES = ("1K", "64K", "1M", "16M")
+
+# every sample runs the benchmark in a loop for at least this long, as pyperf does
+MIN_SAMPLE_TIME = 0.1
+
+# cold start of the GUI, from launching the interpreter until the first window is drawn
+STARTUP_TARGET = 0.150
+STARTUP_SCRIPT = """
+import json, time
+start = time.perf_counter()
+import main
+imported = time.perf_counter()
+try:
+    window = main.Window()
+    window.update()
+    ready = time.perf_counter() - start
+    window.destroy()
+except Exception:
+    # no display: only the imports can be timed
+    ready = None
+print(json.dumps({"import": imported - start, "window": ready}))
+"""
+
+SHIFT = 3
+KEYWORD = "Benchmark"
+
+
+# the original symbol-by-symbol functions, kept as the reference the fast paths are checked against
+
+def reference_caesar(text, shift):
+    return "".join(alphabet[(positions[symbol] + shift) % len(alphabet)] for symbol in text)
+
+
+def reference_vigenere(text, keyword, sign=1):
+    return "".join(alphabet[(positions[text[i]] + sign * positions[keyword[i % len(keyword)]]) % len(alphabet)]
+                   for i in range(len(text)))
+
+
+def reference_vernam(text, keys):
+    return "".join(alphabet[(positions[text[i]] ^ keys[i]) % len(alphabet)] for i in range(len(text)))
+
+
+def reference_frequencies(text):
+    text = text.upper()
+    counts = [text.count(alphabet[i].upper()) for i in range(len(alphabet))]
+    total = sum(counts)
+    return sorted((count / total, alphabet[i].upper()) for i, count in enumerate(counts))
+
+
+def synthetic_corpus(size, seed=0):
+    # printable ASCII with a newline every now and then, so it looks like text to the preview and the crackers
+    symbols = bytes(range(32, 127)) + b"\n"
+    table = bytes(symbols[i % len(symbols)] for i in range(256))
+    return random.Random(seed).randbytes(size).translate(table)
+
+
+def corpus_file(name):
+    if name == "standard":
+        return STANDARD_PATH
+    path_to_corpus = os.path.join(BENCHMARK_DIRECTORY, "corpus-{}.txt".format(name))
+    if not os.path.exists(path_to_corpus):
+        os.makedirs(BENCHMARK_DIRECTORY, exist_ok=True)
+        with open(path_to_corpus + ".tmp", 'wb') as corpus:
+            corpus.write(synthetic_corpus(SIZES[name]))
+        os.replace(path_to_corpus + ".tmp", path_to_corpus)
+    return path_to_corpus
+
+
+def output_file(suffix=".txt"):
+    return os.path.join(BENCHMARK_DIRECTORY, "output-{}{}".format(os.getpid(), suffix))
+
+
+def file_case(cipher, key):
+    def prepare(path_to_corpus, data):
+        path_to_save = output_file()
+        return lambda: stream_file(path_to_corpus, path_to_save, make_stream(cipher, key))
+    return prepare
+
+
+def mapped_case(cipher, key):
+    def prepare(path_to_corpus, data):
+        path_to_save = output_file()
+        return lambda: map_file(path_to_corpus, path_to_save, cipher, key)
+    return prepare
+
+
+def vernam_file_case(mapped):
+    def prepare(path_to_corpus, data):
+        path_to_save = output_file()
+        path_to_key = output_file(".key")
+        if mapped:
+            return lambda: map_file(path_to_corpus, path_to_save, "vernam-encrypt", path_to_key)
+
+        def run():
+            with KeyFileWriter(path_to_key) as key_file:
+                stream_file(path_to_corpus, path_to_save, make_stream("vernam-encrypt", key_file))
+        return run
+    return prepare
+
+
+def vernam_keys(data):
+    return generate_vernam_keys(len(data), VernamKeystream(0))
+
+
+# (cipher, mode) -> prepare(path_to_corpus, data) returning the function to time
+CASES = {
+    ("caesar-encrypt", "str"): lambda path, data: lambda text=data.decode('ascii'): caesar_encryption(text, SHIFT),
+    ("caesar-encrypt", "bytes"): lambda path, data: lambda: caesar_encryption_bytes(data, SHIFT),
+    ("caesar-encrypt", "stream"): file_case("caesar-encrypt", SHIFT),
+    ("caesar-encrypt", "mapped"): mapped_case("caesar-encrypt", SHIFT),
+    ("vigenere-encrypt", "str"):
+        lambda path, data: lambda text=data.decode('ascii'): vigenere_encryption(text, KEYWORD),
+    ("vigenere-encrypt", "bytes"): lambda path, data: lambda: vigenere_encryption_bytes(data, KEYWORD),
+    ("vigenere-encrypt", "stream"): file_case("vigenere-encrypt", KEYWORD),
+    ("vigenere-encrypt", "mapped"): mapped_case("vigenere-encrypt", KEYWORD),
+    ("vernam-encrypt", "str"): lambda path, data: lambda text=data.decode('ascii'): vernam_encryption(text),
+    ("vernam-encrypt", "bytes"): lambda path, data: lambda keys=vernam_keys(data): vernam_bytes(data, keys),
+    ("vernam-encrypt", "stream"): vernam_file_case(mapped=False),
+    ("vernam-encrypt", "mapped"): vernam_file_case(mapped=True),
+    ("vernam-decrypt", "str"):
+        lambda path, data: lambda text=data.decode('ascii'), keys=vernam_keys(data): vernam_decryption(text, keys),
+    ("build-frequencies", "str"): lambda path, data: lambda text=data.decode('ascii'): build_frequencies(text),
+    ("build-frequencies", "bytes"): lambda path, data: lambda: build_histogram(data),
+    ("frequency-analysis", "str"):
+        lambda path, data: lambda text=data.decode('ascii'), profile=load_profile(): frequency_analysis(text, profile),
+    ("check-text", "str"): lambda path, data: lambda text=data.decode('ascii'): check_text(text),
+    ("check-text", "bytes"): lambda path, data: lambda: check_text(data),
+}
+
+
+def time_function(function, repeat):
+    # calibrate the number of loops so one sample takes MIN_SAMPLE_TIME, then take repeat samples
+    loops = 1
+    while True:
+        start = time.perf_counter()
+        for i in range(loops):
+            function()
+        elapsed = time.perf_counter() - start
+        if elapsed >= MIN_SAMPLE_TIME or loops >= 1 << 20:
+            break
+        loops *= 2 if elapsed == 0 else max(2, min(10, int(MIN_SAMPLE_TIME / elapsed) + 1))
+    samples = [elapsed / loops]
+    for i in range(repeat - 1):
+        start = time.perf_counter()
+        for j in range(loops):
+            function()
+        samples.append((time.perf_counter() - start) / loops)
+    return loops, samples
+
+
+def peak_rss():
+    if resource is None:
+        return None
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * (1 if sys.platform == "darwin" else 1024)
+
+
+def run_case(cipher, mode, corpus, repeat):
+    # runs in a fresh process, so the peak RSS belongs to this case alone; the file modes never hold the
+    # corpus in memory, so it is only read for the in-memory ones
+    path_to_corpus = corpus_file(corpus)
+    size = os.path.getsize(path_to_corpus)
+    data = None
+    if mode in ("str", "bytes"):
+        with open(path_to_corpus, 'rb') as source:
+            data = source.read()
+    try:
+        function = CASES[cipher, mode](path_to_corpus, data)
+        loops, samples = time_function(function, repeat)
+
+        tracemalloc.start()
+        function()
+        allocated_peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    finally:
+        for path_to_output in (output_file(), output_file(".key")):
+            if os.path.exists(path_to_output):
+                os.remove(path_to_output)
+
+    median = statistics.median(samples)
+    return {
+        "cipher": cipher,
+        "mode": mode,
+        "corpus": corpus,
+        "size": size,
+        "loops": loops,
+        "samples": samples,
+        "seconds_min": min(samples),
+        "seconds_median": median,
+        "mb_per_s": size / median / 1e6 if median else None,
+        "peak_rss": peak_rss(),
+        "allocated_peak": allocated_peak,
+    }
+
+
+def run_startup(repeat):
+    # every sample is a fresh interpreter, so nothing is cached in memory between them
+    samples = []
+    for i in range(repeat):
+        start = time.perf_counter()
+        output = subprocess.run([sys.executable, "-c", STARTUP_SCRIPT], cwd=os.path.dirname(os.path.abspath(__file__)),
+                                capture_output=True, text=True, check=True).stdout
+        total = time.perf_counter() - start
+        sample = json.loads(output.splitlines()[-1])
+        sample["process"] = total
+        samples.append(sample)
+
+    imports = statistics.median(sample["import"] for sample in samples)
+    windows = [sample["window"] for sample in samples if sample["window"] is not None]
+    # the process time includes tearing the window and the interpreter down again, so it bounds startup from above
+    process = statistics.median(sample["process"] for sample in samples)
+    window = statistics.median(windows) if windows else None
+    return {
+        "samples": samples,
+        "import_median": imports,
+        "window_median": window,
+        "process_median": process,
+        "target": STARTUP_TARGET,
+        "within_target": (window if window is not None else process) <= STARTUP_TARGET,
+    }
+
+
+def check_correctness(data):
+    # the fast paths must give exactly what the symbol-by-symbol reference gives; returns the failures
+    text = data.decode('ascii')
+    keys = vernam_keys(data)
+    failures = []
+
+    def expect(name, actual, expected):
+        if actual != expected:
+            failures.append(name)
+
+    expect("caesar-encrypt", caesar_encryption(text, SHIFT), reference_caesar(text, SHIFT))
+    expect("caesar-decrypt", caesar_decryption(text, SHIFT), reference_caesar(text, -SHIFT))
+    expect("caesar-encrypt bytes", caesar_encryption_bytes(data, SHIFT), reference_caesar(text, SHIFT).encode())
+    expect("vigenere-encrypt", vigenere_encryption(text, KEYWORD), reference_vigenere(text, KEYWORD))
+    expect("vigenere-decrypt", vigenere_decryption(text, KEYWORD), reference_vigenere(text, KEYWORD, -1))
+    expect("vernam-decrypt", vernam_decryption(text, keys), reference_vernam(text, keys))
+    encrypted, generated = vernam_encryption(text)
+    expect("vernam-encrypt", encrypted, reference_vernam(text, generated))
+    expect("build-frequencies", [(f.frequency, f.letter) for f in build_frequencies(text)], reference_frequencies(text))
+    expect("check-text", check_text(text), True)
+
+    os.makedirs(BENCHMARK_DIRECTORY, exist_ok=True)
+    path_to_corpus = output_file(".in")
+    with open(path_to_corpus, 'wb') as corpus:
+        corpus.write(data)
+    for cipher, key, expected in (("caesar-encrypt", SHIFT, reference_caesar(text, SHIFT)),
+                                  ("vigenere-decrypt", KEYWORD, reference_vigenere(text, KEYWORD, -1))):
+        stream_file(path_to_corpus, output_file(), make_stream(cipher, key))
+        with open(output_file(), 'rb') as result:
+            expect("{} stream".format(cipher), result.read(), expected.encode())
+        map_file(path_to_corpus, output_file(), cipher, key)
+        with open(output_file(), 'rb') as result:
+            expect("{} mapped".format(cipher), result.read(), expected.encode())
+    os.remove(path_to_corpus)
+    os.remove(output_file())
+    return failures
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=os.path.dirname(os.path.abspath(__file__)),
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, path_to_baseline):
+    with open(path_to_baseline) as baseline_file:
+        baseline = {(row["cipher"], row["mode"], row["corpus"]): row for row in json.load(baseline_file)["results"]}
+    for row in results:
+        old = baseline.get((row["cipher"], row["mode"], row["corpus"]))
+        if old is not None and old["seconds_median"] and row["seconds_median"]:
+            print("{:<20} {:<7} {:>9}: {:.2f}x".format(row["cipher"], row["mode"], row["corpus"],
+                                                      old["seconds_median"] / row["seconds_median"]))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="benchmark.py", description="Benchmark the CryptorPython ciphers.")
+    parser.add_argument("--sizes", default=",".join(DEFAULT_SIZES),
+                        help="synthetic corpus sizes out of {}".format(",".join(SIZES)))
+    parser.add_argument("--cipher", action="append", help="only these ciphers (repeatable)")
+    parser.add_argument("--mode", action="append", choices=("str", "bytes", "stream", "mapped"),
+                        help="only these modes (repeatable)")
+    parser.add_argument("--repeat", type=int, default=5, help="samples per benchmark")
+    parser.add_argument("-o", "--output", default="-", help="JSON results file, '-' for stdout")
+    parser.add_argument("--compare", help="JSON results of an earlier run to print speedups against")
+    parser.add_argument("--startup", action="store_true", help="only time the start of the GUI")
+    args = parser.parse_args(argv)
+
+    corpora = ["standard"] + [size for size in args.sizes.split(",") if size]
+    for corpus in corpora:
+        if corpus != "standard" and corpus not in SIZES:
+            parser.error("unknown size: {}".format(corpus))
+
+    with open(STANDARD_PATH, 'rb') as standard:
+        failures = check_correctness(standard.read()) + check_correctness(synthetic_corpus(SIZES["64K"]))
+    for failure in failures:
+        print("mismatch against the reference: {}".format(failure), file=sys.stderr)
+
+    startup = run_startup(args.repeat)
+    print("startup: imports {:.1f} ms, window {}, whole process {:.1f} ms (target {:.0f} ms)".format(
+        startup["import_median"] * 1000,
+        "n/a" if startup["window_median"] is None else "{:.1f} ms".format(startup["window_median"] * 1000),
+        startup["process_median"] * 1000, STARTUP_TARGET * 1000), file=sys.stderr)
+
+    results = []
+    cases = [case for case in CASES if not args.startup and (args.cipher is None or case[0] in args.cipher)
+             and (args.mode is None or case[1] in args.mode)]
+    context = multiprocessing.get_context("spawn")
+    for corpus in corpora if cases else []:
+        corpus_file(corpus)
+        for cipher, mode in cases:
+            with concurrent.futures.ProcessPoolExecutor(1, mp_context=context) as executor:
+                row = executor.submit(run_case, cipher, mode, corpus, args.repeat).result()
+            print("{:<20} {:<7} {:>9}: {:10.1f} MB/s, peak RSS {:>8}, allocated {:8.1f} MB".format(
+                cipher, mode, corpus, row["mb_per_s"] or float('inf'),
+                "n/a" if row["peak_rss"] is None else "{:.1f} MB".format(row["peak_rss"] / 1e6),
+                row["allocated_peak"] / 1e6), file=sys.stderr)
+            results.append(row)
+
+    report = {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "numpy": getattr(load_numpy(), "__version__", None),
+        "platform": platform.platform(),
+        "correctness": {"passed": not failures, "failures": failures},
+        "startup": startup,
+        "results": results,
+    }
+    if args.output == "-":
+        json.dump(report, sys.stdout, indent=1)
+        print()
+    else:
+        with open(args.output, 'w') as output:
+            json.dump(report, output, indent=1)
+    if args.compare:
+        compare(results, args.compare)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
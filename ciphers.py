@@ -0,0 +1,265 @@
+import collections
+import math
+import os
+import random
+import re
+import threading
+
+alphabet = [x.to_bytes(1, byteorder='big', signed=True).decode() for x in range(128)]
+
+positions = dict()
+for pos in range(len(alphabet)):
+    positions[alphabet[pos]] = pos
+
+# Vernam keys take values in [0, 2 ** VERNAM_KEY_BITS)
+VERNAM_KEY_BITS = math.ceil(math.log(len(alphabet)))
+_vernam_key_table = bytes([x % 2 ** VERNAM_KEY_BITS for x in range(256)])
+
+# numpy is optional and only worth importing (which is slow) for big buffers
+NUMPY_THRESHOLD = 1 << 16
+_numpy = False
+
+
+def load_numpy():
+    global _numpy
+    if _numpy is False:
+        try:
+            import numpy
+            _numpy = numpy
+        except ImportError:
+            _numpy = None
+    return _numpy
+
+
+# the Vigenere key is repeated up to at least this many bytes once, so long texts tile a block instead of the key
+VIGENERE_BLOCK_SIZE = 1 << 12
+
+
+class CipherCache:
+
+    # least recently used compiled keys, evicted past max_entries entries or max_bytes bytes
+    def __init__(self, max_entries=1024, max_bytes=64 << 20):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.entries = collections.OrderedDict()
+        self.lock = threading.Lock()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, build):
+        # shared by the GUI worker and executor threads; a key is built outside the lock (building a Vigenere
+        # key looks up Caesar tables in the same cache), so two threads may build it, and the last one wins
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.hits += 1
+                self.entries.move_to_end(key)
+                return entry[0]
+            self.misses += 1
+        value = build()
+        size = len(value)
+        if size <= self.max_bytes:
+            with self.lock:
+                replaced = self.entries.pop(key, None)
+                if replaced is not None:
+                    self.size -= replaced[1]
+                self.entries[key] = (value, size)
+                self.size += size
+                while len(self.entries) > self.max_entries or self.size > self.max_bytes:
+                    self.size -= self.entries.popitem(last=False)[1][1]
+                    self.evictions += 1
+        return value
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+
+    def stats(self):
+        with self.lock:
+            return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+                    "entries": len(self.entries), "bytes": self.size}
+
+
+# compiled keys of every cipher: Caesar tables, Vigenere shift vectors and Vernam key arrays
+cipher_cache = CipherCache()
+
+
+_invalid_symbol = re.compile('[^\x00-\x7f]')
+_invalid_byte = re.compile(b'[\x80-\xff]')
+
+
+class InvalidSymbolError(ValueError):
+
+    def __init__(self, offset, value):
+        ValueError.__init__(self, "Text contains wrong symbols! First one is {:#x} at offset {}".format(value, offset))
+        self.offset = offset
+        self.value = value
+
+    def __reduce__(self):
+        # rebuilt from offset and value, so the error survives being sent back from a worker process
+        return type(self), (self.offset, self.value)
+
+
+def find_invalid_symbol(text):
+    # (offset, code) of the first symbol outside the alphabet, or None
+    if text.isascii():
+        return None
+    if isinstance(text, str):
+        match = _invalid_symbol.search(text)
+        return match.start(), ord(match.group())
+    match = _invalid_byte.search(text)
+    return match.start(), match.group()[0]
+
+
+def validate_text(text, offset=0):
+    invalid = find_invalid_symbol(text)
+    if invalid is not None:
+        raise InvalidSymbolError(offset + invalid[0], invalid[1])
+    return text
+
+
+def check_text(text):
+    return find_invalid_symbol(text) is None
+
+
+def encode_text(text):
+    # encoding is the validation: it stops at the first non-ASCII symbol without a separate scan
+    try:
+        return text.encode('ascii')
+    except UnicodeEncodeError as error:
+        raise InvalidSymbolError(error.start, ord(text[error.start])) from None
+
+
+def caesar_table(shift):
+    # a 256-entry bytes.translate table; bytes outside the alphabet map to themselves
+    shift %= len(alphabet)
+    return cipher_cache.get(("caesar", shift), lambda: bytes([(x + shift) % len(alphabet) for x in range(len(alphabet))])
+                            + bytes(range(len(alphabet), 256)))
+
+
+def caesar_encryption_bytes(data, shift):
+    return data.translate(caesar_table(shift))
+
+
+def caesar_decryption_bytes(data, shift):
+    return caesar_encryption_bytes(data, -shift)
+
+
+def caesar_encryption(text_to_decrypt, shift):
+    return caesar_encryption_bytes(encode_text(text_to_decrypt), shift).decode('ascii')
+
+
+def caesar_decryption(text_to_encrypt, shift):
+    return caesar_encryption(text_to_encrypt, -shift)
+
+
+def vigenere_shifts(keyword):
+    if len(keyword) == 0:
+        raise ValueError("Keyword must not be empty")
+    try:
+        return bytes([positions[symbol] for symbol in keyword])
+    except KeyError as error:
+        raise ValueError("Keyword contains a symbol outside the alphabet: {!r}".format(error.args[0])) from None
+
+
+class VigenereKey:
+
+    # a compiled keyword: its shifts repeated to a whole number of keywords at least VIGENERE_BLOCK_SIZE long,
+    # and the Caesar table of every key column
+    def __init__(self, keyword, decrypt):
+        shifts = vigenere_shifts(keyword)
+        if decrypt:
+            shifts = bytes([(-shift) % len(alphabet) for shift in shifts])
+        self.block = shifts * -(-VIGENERE_BLOCK_SIZE // len(shifts))
+        self.tables = [caesar_table(shift) for shift in shifts]
+
+    def __len__(self):
+        return len(self.block) + 8 * len(self.tables)
+
+
+def vigenere_key(keyword, decrypt=False):
+    return cipher_cache.get(("vigenere", keyword, decrypt), lambda: VigenereKey(keyword, decrypt))
+
+
+def _vigenere_bytes(data, keyword, offset, decrypt):
+    key = vigenere_key(keyword, decrypt)
+    if len(data) == 0:
+        return b""
+    length = len(keyword)
+    offset %= length
+
+    numpy = load_numpy() if len(data) >= NUMPY_THRESHOLD else None
+    if numpy is not None:
+        text = numpy.frombuffer(data, dtype=numpy.uint8)
+        block = numpy.frombuffer(key.block, dtype=numpy.uint8)
+        tiled_key = numpy.tile(block, -(-(len(text) + offset) // len(block)))
+        answer = numpy.add(text, tiled_key[offset:offset + len(text)])
+        # the alphabet size is a power of two, so masking is the (much faster) modulo
+        numpy.bitwise_and(answer, len(alphabet) - 1, out=answer)
+        return answer.tobytes()
+
+    # without numpy every key column is a Caesar shift: translate each strided column in one call
+    answer = bytearray(len(data))
+    for column in range(min(length, len(data))):
+        answer[column::length] = data[column::length].translate(key.tables[(column + offset) % length])
+    return bytes(answer)
+
+
+def vigenere_encryption_bytes(data, keyword, offset=0):
+    return _vigenere_bytes(data, keyword, offset, decrypt=False)
+
+
+def vigenere_decryption_bytes(data, keyword, offset=0):
+    return _vigenere_bytes(data, keyword, offset, decrypt=True)
+
+
+def vigenere_encryption(text_to_decrypt, keyword):
+    return vigenere_encryption_bytes(encode_text(text_to_decrypt), keyword).decode('ascii')
+
+
+def vigenere_decryption(text_to_decrypt, keyword):
+    return vigenere_decryption_bytes(encode_text(text_to_decrypt), keyword).decode('ascii')
+
+
+class VernamKeystream:
+
+    def __init__(self, seed=None):
+        # without a seed keys come from os.urandom, with one they are reproducible
+        self.generator = None if seed is None else random.Random(seed)
+
+    def generate(self, count):
+        if self.generator is None:
+            data = os.urandom(count)
+        else:
+            data = self.generator.randbytes(count)
+        # 2 ** VERNAM_KEY_BITS divides 256, so masking random bytes keeps every key equally likely
+        return data.translate(_vernam_key_table)
+
+
+def generate_vernam_keys(count, keystream=None):
+    return (keystream or VernamKeystream()).generate(count)
+
+
+def vernam_bytes(data, keys):
+    if len(keys) < len(data):
+        raise ValueError("Not enough keys: {} for {} symbols".format(len(keys), len(data)))
+    if not isinstance(keys, (bytes, bytearray, memoryview)):
+        keys = bytes([key % len(alphabet) for key in keys[:len(data)]])
+    numpy = load_numpy() if len(data) >= NUMPY_THRESHOLD else None
+    if numpy is not None:
+        return numpy.bitwise_xor(numpy.frombuffer(data, dtype=numpy.uint8),
+                                 numpy.frombuffer(keys, dtype=numpy.uint8, count=len(data))).tobytes()
+    mixed = int.from_bytes(data, 'little') ^ int.from_bytes(keys[:len(data)], 'little')
+    return mixed.to_bytes(len(data), 'little')
+
+
+def vernam_encryption(text_to_decrypt, keystream=None):
+    keys = generate_vernam_keys(len(text_to_decrypt), keystream)
+    return [vernam_bytes(encode_text(text_to_decrypt), keys).decode('ascii'), keys]
+
+
+def vernam_decryption(text_to_decrypt, keys):
+    return vernam_bytes(encode_text(text_to_decrypt), keys).decode('ascii')
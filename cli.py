@@ -0,0 +1,254 @@
+import argparse
+import contextlib
+import csv
+import os
+import sys
+import time
+
+import metrics
+from ciphers import validate_text
+# the container, cracking, directory, follow and frequency modules (and the process pool machinery the
+# directory mode needs) are imported by the commands that use them, so a plain cipher run does not load them
+from keyfile import KeyFileWriter, open_keys
+from mapped import map_file
+from streaming import CHUNK_SIZE, STREAM_CIPHERS, make_stream, stream_cipher, check_distinct
+
+CIPHERS = STREAM_CIPHERS + ("frequency-analysis", "vigenere-crack")
+
+
+def open_input(path):
+    if path == "-":
+        return contextlib.nullcontext(sys.stdin.buffer)
+    return open(path, 'rb')
+
+
+def open_output(path):
+    if path == "-":
+        return contextlib.nullcontext(sys.stdout.buffer)
+    return open(path, 'wb')
+
+
+def run_cipher(source, destination, cipher, key, chunk_size=CHUNK_SIZE):
+    if cipher == "vernam-encrypt":
+        with KeyFileWriter(key) as key_file:
+            return stream_cipher(source, destination, make_stream(cipher, key_file), chunk_size)
+    if cipher == "vernam-decrypt":
+        with open_keys(key) as key_file:
+            return stream_cipher(source, destination, make_stream(cipher, key_file), chunk_size)
+    if cipher in ("frequency-analysis", "vigenere-crack"):
+        from frequency import STANDARD_PATH, load_profile
+    if cipher == "frequency-analysis":
+        from frequency import frequency_analysis
+        profile = load_profile(key or STANDARD_PATH)
+        to_decrypt = validate_text(source.read())
+        destination.write(frequency_analysis(to_decrypt, profile))
+        return len(to_decrypt)
+    if cipher == "vigenere-crack":
+        from cracking import crack_vigenere
+        profile = load_profile(key or STANDARD_PATH)
+        to_decrypt = validate_text(source.read())
+        cracked = crack_vigenere(to_decrypt, profile)
+        destination.write(cracked.text)
+        print("keyword: {!r} (score {:.3f}, confidence {:.2f})".format(
+            cracked.keyword, cracked.score, cracked.confidence), file=sys.stderr)
+        return len(to_decrypt)
+    return stream_cipher(source, destination, make_stream(cipher, key), chunk_size)
+
+
+def run_job(path_to_file, path_to_save, cipher, key, chunk_size=CHUNK_SIZE, jobs=1):
+    start = time.perf_counter()
+    if jobs > 1 and cipher in STREAM_CIPHERS and "-" not in (path_to_file, path_to_save):
+        # imported here so single-process runs do not pay for the process pool machinery
+        from parallel import parallel_file
+        processed = parallel_file(path_to_file, path_to_save, cipher, key, jobs, chunk_size)
+    elif cipher in STREAM_CIPHERS and "-" not in (path_to_file, path_to_save) and os.path.isfile(path_to_file):
+        processed = map_file(path_to_file, path_to_save, cipher, key)
+    else:
+        if "-" not in (path_to_file, path_to_save):
+            check_distinct(path_to_file, path_to_save, *([key] if cipher.startswith("vernam") else []))
+        elif path_to_save != "-" and cipher.startswith("vernam"):
+            check_distinct(path_to_save, key)
+        with open_input(path_to_file) as source, open_output(path_to_save) as destination:
+            processed = run_cipher(source, destination, cipher, key, chunk_size)
+    return processed, time.perf_counter() - start
+
+
+def report(path_to_file, path_to_save, cipher, processed, elapsed):
+    throughput = processed / elapsed / 1e6 if elapsed > 0 else float('inf')
+    print("{}: {} -> {}: {} bytes in {:.3f} s ({:.1f} MB/s)".format(
+        cipher, path_to_file, path_to_save, processed, elapsed, throughput), file=sys.stderr)
+
+
+def read_manifest(path_to_manifest):
+    with open(path_to_manifest, newline='') as manifest:
+        for row in csv.reader(manifest):
+            if len(row) == 0 or row[0].startswith('#'):
+                continue
+            if len(row) not in (3, 4):
+                raise ValueError("Manifest row must be input,output,cipher[,key]: {}".format(row))
+            yield row[0], row[1], row[2], row[3] if len(row) == 4 else ""
+
+
+def run_batch(path_to_manifest, chunk_size=CHUNK_SIZE, jobs=1):
+    failed = 0
+    for path_to_file, path_to_save, cipher, key in read_manifest(path_to_manifest):
+        try:
+            processed, elapsed = run_job(path_to_file, path_to_save, cipher, key, chunk_size, jobs)
+        except (OSError, ValueError) as error:
+            print("{}: {} -> {}: failed: {}".format(cipher, path_to_file, path_to_save, error), file=sys.stderr)
+            failed += 1
+            continue
+        report(path_to_file, path_to_save, cipher, processed, elapsed)
+    return 1 if failed else 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="cli.py", description="Run CryptorPython ciphers without the GUI.")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE, help="bytes read per chunk")
+    parser.add_argument("--jobs", type=int, default=1,
+                        help="split big files (or a directory's files) across this many processes "
+                             "(file input and output only)")
+    parser.add_argument("--metrics", metavar="FILE", help="time every stage and append the totals to this JSON log")
+    parser.add_argument("--prometheus", metavar="FILE", help="time every stage and write the totals for Prometheus")
+    parser.add_argument("--profile", metavar="FILE", help="run under cProfile and save the stats here "
+                                                             "(with --jobs, only the parent process is profiled)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    for cipher in CIPHERS:
+        command = commands.add_parser(cipher)
+        if cipher in ("frequency-analysis", "vigenere-crack"):
+            command.add_argument("key", nargs="?", default="", help="path to the standard text")
+        elif cipher.startswith("caesar"):
+            command.add_argument("key", help="shift")
+        elif cipher.startswith("vigenere"):
+            command.add_argument("key", help="keyword")
+        else:
+            command.add_argument("key", help="path to the key-file")
+        command.add_argument("-i", "--input", default="-", help="file to read, '-' for stdin")
+        command.add_argument("-o", "--output", default="-", help="file to write, '-' for stdout")
+        command.add_argument("--report", action="store_true", help="print throughput to stderr")
+
+    batch = commands.add_parser("batch", help="run every job of a CSV manifest: input,output,cipher[,key]")
+    batch.add_argument("manifest")
+
+    pack = commands.add_parser("container-encrypt", help="encrypt into a seekable chunk-indexed container")
+    pack.add_argument("cipher", help="caesar, vigenere or vernam")
+    pack.add_argument("key", help="shift, keyword or, for vernam, the key-file to create")
+    pack.add_argument("-i", "--input", default="-", help="file to read, '-' for stdin")
+    pack.add_argument("-o", "--output", required=True, help="container file to write")
+    pack.add_argument("--container-chunk-size", type=int,
+                      help="bytes per container chunk, the unit of random access (default: 64 KiB)")
+
+    extract = commands.add_parser("container-decrypt", help="decrypt all or a byte range of a container")
+    extract.add_argument("key", help="shift, keyword or, for vernam, the container's key-file")
+    extract.add_argument("-i", "--input", required=True, help="container file to read")
+    extract.add_argument("-o", "--output", default="-", help="file to write, '-' for stdout")
+    extract.add_argument("--start", type=int, default=0, help="first symbol to decrypt")
+    extract.add_argument("--end", type=int, help="symbol to stop before (default: the end)")
+
+    follow = commands.add_parser("follow", help="keep ciphering what is appended to a growing file")
+    follow.add_argument("cipher", choices=STREAM_CIPHERS)
+    follow.add_argument("key", help="shift, keyword or path to the key-file")
+    follow.add_argument("-i", "--input", required=True, help="file to follow")
+    follow.add_argument("-o", "--output", required=True, help="file to write")
+    follow.add_argument("--checkpoint", help="where the position is saved (default: OUTPUT.checkpoint)")
+    follow.add_argument("--interval", type=float, help="seconds between checks (default: 0.5)")
+    follow.add_argument("--once", action="store_true", help="cipher what has been appended and stop")
+
+    directory = commands.add_parser("directory", help="cipher every file under a directory with one key")
+    directory.add_argument("cipher", help="caesar-encrypt, caesar-decrypt, vigenere-encrypt or vigenere-decrypt")
+    directory.add_argument("key", help="shift or keyword")
+    directory.add_argument("source", help="directory to walk")
+    directory.add_argument("-o", "--output", help="mirror the tree into this directory instead of writing "
+                                                  "the results next to the inputs")
+    directory.add_argument("--suffix", default=".enc", help="appended to results written next to the inputs; "
+                           "decrypting in place takes the files with this suffix and writes NAME.dec")
+    directory.add_argument("--manifest", help="progress file for resuming (default: in the output directory)")
+    return parser
+
+
+def run_directory(args):
+    from directory import cipher_directory
+    try:
+        done, skipped, failed = cipher_directory(args.source, args.cipher, args.key, args.output, args.suffix,
+                                                 args.jobs, args.manifest)
+    except (OSError, ValueError) as error:
+        print("directory: {}".format(error), file=sys.stderr)
+        return 1
+    for relative, error in sorted(failed.items()):
+        print("{}: failed: {}".format(relative, error), file=sys.stderr)
+    print("{} files done, {} already done, {} failed".format(done, skipped, len(failed)), file=sys.stderr)
+    return 1 if failed else 0
+
+
+def run_container(args):
+    from container import CONTAINER_CHUNK_SIZE, ContainerReader, pack_container
+    try:
+        if args.command == "container-encrypt":
+            if args.input != "-":
+                check_distinct(args.input, args.output, *([args.key] if args.cipher == "vernam" else []))
+            with open_input(args.input) as source:
+                pack_container(source, args.output, args.cipher, args.key,
+                               args.container_chunk_size or CONTAINER_CHUNK_SIZE)
+        else:
+            with ContainerReader(args.input, args.key) as container:
+                if args.output != "-":
+                    check_distinct(args.input, args.output, *([args.key] if container.cipher == "vernam" else []))
+                with open_output(args.output) as destination:
+                    # a range is deciphered a few chunks at a time, so a huge one never sits in memory whole
+                    end = container.length if args.end is None else min(args.end, container.length)
+                    step = container.chunk_size * 16
+                    for position in range(args.start, end, step):
+                        destination.write(container.read(position, min(position + step, end)))
+    except (OSError, ValueError) as error:
+        print("{}: {}".format(args.command, error), file=sys.stderr)
+        return 1
+    return 0
+
+
+def run_follow(args):
+    from follow import POLL_INTERVAL, follow_file
+    try:
+        follow_file(args.input, args.output, args.cipher, args.key, args.checkpoint or args.output + ".checkpoint",
+                    POLL_INTERVAL if args.interval is None else args.interval, args.once, args.chunk_size)
+    except KeyboardInterrupt:
+        # everything up to the last checkpoint is kept; the next run resumes from there
+        return 0
+    except (OSError, ValueError) as error:
+        print("follow: {}".format(error), file=sys.stderr)
+        return 1
+    return 0
+
+
+def run_command(args):
+    if args.command == "batch":
+        return run_batch(args.manifest, args.chunk_size, args.jobs)
+    if args.command == "directory":
+        return run_directory(args)
+    if args.command == "follow":
+        return run_follow(args)
+    if args.command in ("container-encrypt", "container-decrypt"):
+        return run_container(args)
+
+    try:
+        processed, elapsed = run_job(args.input, args.output, args.command, args.key, args.chunk_size, args.jobs)
+    except (OSError, ValueError) as error:
+        print("{}: {}".format(args.command, error), file=sys.stderr)
+        return 1
+    if args.report:
+        report(args.input, args.output, args.command, processed, elapsed)
+    return 0
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.metrics or args.prometheus:
+        metrics.enable()
+    with metrics.profiled(args.profile or os.environ.get(metrics.PROFILE_VARIABLE)):
+        status = run_command(args)
+    metrics.dump(args.metrics, args.prometheus, command=args.command, status=status)
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
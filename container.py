@@ -0,0 +1,176 @@
+import struct
+import zlib
+
+from ciphers import validate_text
+from keyfile import KeyFileWriter, open_keys, unpack_header, HEADER_SIZE as KEY_HEADER_SIZE
+from streaming import make_stream, check_distinct
+
+# container: header, the ciphertext in fixed-size chunks, an index of (offset, length, CRC32) per chunk
+# and a trailer pointing at the index. The ciphers keep the length, so chunk i holds text[i * chunk_size:...]
+CONTAINER_MAGIC = b"CPVC"
+CONTAINER_VERSION = 1
+INDEX_MAGIC = b"CPVI"
+CONTAINER_CHUNK_SIZE = 1 << 16
+
+# magic, version, cipher, chunk size, text length, key length, key checksum: only what is needed to check
+# the key and find the key phase is stored, never the key itself
+_header = struct.Struct("<4sBBIQQI")
+_entry = struct.Struct("<QII")
+# index offset, number of chunks, magic
+_trailer = struct.Struct("<QI4s")
+
+CONTAINER_CIPHERS = ("caesar", "vigenere", "vernam")
+
+
+class ContainerWriter:
+
+    def __init__(self, path_to_save, cipher, key, chunk_size=CONTAINER_CHUNK_SIZE):
+        # cipher is "caesar", "vigenere" or "vernam"; for Vernam key is the path of the key-file to create
+        if cipher not in CONTAINER_CIPHERS:
+            raise ValueError("Unknown container cipher: {}".format(cipher))
+        if cipher == "vernam":
+            check_distinct(path_to_save, key)
+        self.cipher = cipher
+        self.chunk_size = chunk_size
+        self.key_file = KeyFileWriter(key) if cipher == "vernam" else None
+        self.stream = make_stream(cipher + "-encrypt", key if self.key_file is None else self.key_file)
+        self.key_length = len(key) if cipher == "vigenere" else 0
+        self.file = open(path_to_save, 'wb')
+        self.file.write(self._header(0, 0))
+        self.pending = b""
+        self.length = 0
+        self.index = []
+
+    def _header(self, length, checksum):
+        return _header.pack(CONTAINER_MAGIC, CONTAINER_VERSION, CONTAINER_CIPHERS.index(self.cipher),
+                            self.chunk_size, length, self.key_length, checksum)
+
+    def _write_chunk(self, chunk):
+        validate_text(chunk, self.length)
+        answer = self.stream.transform(chunk)
+        self.index.append((self.file.tell(), len(answer), zlib.crc32(answer)))
+        self.file.write(answer)
+        self.length += len(chunk)
+
+    def write(self, data):
+        data = self.pending + data
+        end = len(data) - len(data) % self.chunk_size
+        for start in range(0, end, self.chunk_size):
+            self._write_chunk(data[start:start + self.chunk_size])
+        self.pending = data[end:]
+
+    def abort(self):
+        # leaves the container without an index, so readers refuse it instead of returning a cut-off text
+        self.file.close()
+        if self.key_file is not None:
+            self.key_file.close()
+
+    def close(self):
+        if self.file.closed:
+            return
+        if self.pending:
+            self._write_chunk(self.pending)
+            self.pending = b""
+        index_offset = self.file.tell()
+        self.file.write(b"".join(_entry.pack(*entry) for entry in self.index))
+        self.file.write(_trailer.pack(index_offset, len(self.index), INDEX_MAGIC))
+        checksum = 0
+        if self.key_file is not None:
+            self.key_file.close()
+            checksum = self.key_file.checksum
+            self.key_length = self.key_file.length
+        self.file.seek(0)
+        self.file.write(self._header(self.length, checksum))
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc_info):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+class ContainerReader:
+
+    def __init__(self, path_to_container, key):
+        # key is the shift, the keyword or the path of the matching binary key-file
+        self.file = open(path_to_container, 'rb')
+        try:
+            magic, version, cipher, self.chunk_size, self.length, key_length, checksum = \
+                _header.unpack(self.file.read(_header.size))
+            if magic != CONTAINER_MAGIC:
+                raise ValueError("Not a container")
+            if version != CONTAINER_VERSION:
+                raise ValueError("Unsupported container version: {}".format(version))
+            self.cipher = CONTAINER_CIPHERS[cipher]
+
+            self.file.seek(-_trailer.size, 2)
+            index_offset, count, magic = _trailer.unpack(self.file.read(_trailer.size))
+            if magic != INDEX_MAGIC:
+                raise ValueError("Container has no index, it was not closed properly")
+            self.file.seek(index_offset)
+            self.index = list(_entry.iter_unpack(self.file.read(count * _entry.size)))
+
+            if self.cipher == "vigenere" and len(key) != key_length:
+                raise ValueError("Keyword is not the one the container was encrypted with")
+            if self.cipher == "vernam":
+                with open(key, 'rb') as key_file:
+                    if unpack_header(key_file.read(KEY_HEADER_SIZE)) != (key_length, checksum):
+                        raise ValueError("Key-file does not belong to the container")
+            self.key = key
+        except BaseException:
+            self.file.close()
+            raise
+
+    def read(self, start=0, end=None):
+        # the plaintext of symbols [start, end), deciphering only the chunks that cover it
+        end = self.length if end is None else min(end, self.length)
+        start = max(0, start)
+        if start >= end:
+            return b""
+        first, last = start // self.chunk_size, (end - 1) // self.chunk_size
+        chunk_start = first * self.chunk_size
+
+        key_file = open_keys(self.key, chunk_start) if self.cipher == "vernam" else None
+        try:
+            # the Vigenere phase of the first chunk follows from its offset, the Vernam keys from the key-file
+            stream = make_stream(self.cipher + "-decrypt", self.key if key_file is None else key_file, chunk_start)
+            answer = []
+            for offset, length, checksum in self.index[first:last + 1]:
+                self.file.seek(offset)
+                chunk = self.file.read(length)
+                if len(chunk) != length or zlib.crc32(chunk) != checksum:
+                    raise ValueError("Container chunk at offset {} is damaged".format(offset))
+                answer.append(stream.transform(chunk))
+        finally:
+            if key_file is not None:
+                key_file.close()
+        return b"".join(answer)[start - chunk_start:end - chunk_start]
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def pack_container(source, path_to_save, cipher, key, chunk_size=CONTAINER_CHUNK_SIZE, read_size=1 << 20):
+    with ContainerWriter(path_to_save, cipher, key, chunk_size) as container:
+        while True:
+            data = source.read(read_size)
+            if not data:
+                break
+            container.write(data)
+    # only counts the last, partial chunk once close has written it
+    return container.length
+
+
+def read_container(path_to_container, key, start=0, end=None):
+    with ContainerReader(path_to_container, key) as container:
+        return container.read(start, end)
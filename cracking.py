@@ -0,0 +1,148 @@
+import math
+from dataclasses import dataclass
+
+import metrics
+from ciphers import alphabet, encode_text, load_numpy, NUMPY_THRESHOLD, vigenere_decryption_bytes
+from frequency import Histogram, as_profile, reference_probabilities, score_shifts
+
+MAX_KEY_LENGTH = 32
+
+# the key length is estimated on a prefix this long, which already gives every column thousands of symbols
+LENGTH_SAMPLE_SIZE = 1 << 18
+
+# the NumPy path counts the symbols of every column of several candidate lengths in one pass: by position
+# modulo a common multiple of theirs of at most this many columns, whose rows are then folded per length
+SHARED_COLUMNS = 1 << 10
+
+# a key length is taken once its index of coincidence is this close to the best one,
+# so multiples of the real length (which score just as well) are not preferred
+COINCIDENCE_TOLERANCE = 0.9
+
+
+@dataclass
+class KeyLengthScore:
+    length: int
+    coincidence: float
+
+
+@dataclass
+class VigenereCrack:
+    keyword: str
+    score: float
+    confidence: float
+    lengths: list
+    text: object
+
+
+def column_histograms(data, length):
+    # the histograms of the symbols at positions i, i + length, i + 2 * length, ... for every column i
+    numpy = load_numpy() if len(data) >= NUMPY_THRESHOLD else None
+    if numpy is not None:
+        symbols = numpy.frombuffer(data, dtype=numpy.uint8).astype(numpy.int64)
+        columns = numpy.arange(len(symbols), dtype=numpy.int64) % length
+        counts = numpy.bincount(columns * 256 + symbols, minlength=length * 256).reshape(length, 256)
+        return [Histogram(row) for row in counts.tolist()]
+    # no numpy: a strided slice per column is still counted in C
+    return [Histogram([0] * 256).update(data[column::length]) for column in range(length)]
+
+
+def index_of_coincidence(histograms):
+    coincidences = []
+    for histogram in histograms:
+        size = histogram.total()
+        if size > 1:
+            coincidences.append(sum(count * (count - 1) for count in histogram.counts) / (size * (size - 1)))
+    return sum(coincidences) / len(coincidences) if coincidences else 0.0
+
+
+def shared_moduli(max_length, limit=SHARED_COLUMNS):
+    # a few moduli of at most limit columns, such that every length up to max_length divides one of them
+    moduli = []
+    for length in range(max_length, 0, -1):
+        if any(modulus % length == 0 for modulus in moduli):
+            continue
+        for index, modulus in enumerate(moduli):
+            if math.lcm(modulus, length) <= limit:
+                moduli[index] = math.lcm(modulus, length)
+                break
+        else:
+            moduli.append(length)
+    return moduli
+
+
+def _coincidences(data, max_length, numpy):
+    # index of coincidence of every length up to max_length, from one counting pass per shared modulus
+    symbols = numpy.frombuffer(data, dtype=numpy.uint8).astype(numpy.int64)
+    positions = numpy.arange(len(symbols), dtype=numpy.int64)
+    coincidences = dict()
+    for modulus in shared_moduli(max_length):
+        counts = numpy.bincount(positions % modulus * 256 + symbols, minlength=modulus * 256).reshape(modulus, 256)
+        for length in range(1, max_length + 1):
+            if modulus % length or length in coincidences:
+                continue
+            columns = counts.reshape(modulus // length, length, 256).sum(axis=0)
+            sizes = columns.sum(axis=1)
+            pairs = (columns * (columns - 1)).sum(axis=1)
+            filled = sizes > 1
+            coincidences[length] = float((pairs[filled] / (sizes[filled] * (sizes[filled] - 1))).mean()) \
+                if filled.any() else 0.0
+    return coincidences
+
+
+def rank_key_lengths(data, max_length=MAX_KEY_LENGTH):
+    data = data[:LENGTH_SAMPLE_SIZE]
+    max_length = max(1, min(max_length, len(data) // 2))
+    numpy = load_numpy() if len(data) >= NUMPY_THRESHOLD else None
+    if numpy is not None:
+        coincidences = _coincidences(data, max_length, numpy)
+        return [KeyLengthScore(length, coincidences[length]) for length in range(1, max_length + 1)]
+    # without numpy every candidate length is counted on its own, each column a strided slice counted in C
+    return [KeyLengthScore(length, index_of_coincidence(column_histograms(data, length)))
+            for length in range(1, max_length + 1)]
+
+
+def choose_key_length(lengths):
+    best = max(score.coincidence for score in lengths)
+    for score in lengths:
+        if score.coincidence >= COINCIDENCE_TOLERANCE * best:
+            return score.length
+    return 1
+
+
+def shortest_period(shifts):
+    for length in range(1, len(shifts) + 1):
+        if len(shifts) % length == 0 and shifts[:length] * (len(shifts) // length) == shifts:
+            return shifts[:length]
+    return shifts
+
+
+def crack_vigenere(ciphertext, standard=None, max_length=MAX_KEY_LENGTH, key_length=None):
+    data = encode_text(ciphertext) if isinstance(ciphertext, str) else bytes(ciphertext)
+    probabilities = reference_probabilities(as_profile(standard))
+
+    with metrics.stage("key-length", min(len(data), LENGTH_SAMPLE_SIZE)):
+        lengths = rank_key_lengths(data, max_length)
+    if key_length is None:
+        key_length = choose_key_length(lengths)
+
+    shifts = []
+    confidences = []
+    log_likelihood = 0.0
+    with metrics.stage("histogram", len(data)):
+        histograms = column_histograms(data, key_length)
+    with metrics.stage("score"):
+        for histogram in histograms:
+            scores = score_shifts(histogram, probabilities)
+            best = min(scores, key=lambda score: (score.chi_squared, score.shift))
+            shifts.append(best.shift)
+            confidences.append(best.confidence)
+            log_likelihood += best.log_likelihood
+
+    keyword = "".join(alphabet[shift] for shift in shortest_period(shifts))
+    with metrics.stage("cipher", len(data)):
+        text = vigenere_decryption_bytes(data, keyword)
+    if isinstance(ciphertext, str):
+        text = text.decode('ascii')
+    # score: average log-probability per symbol of the recovered text
+    score = log_likelihood / len(data) if data else 0.0
+    return VigenereCrack(keyword, score, min(confidences, default=0.0), lengths, text)
@@ -0,0 +1,187 @@
+import hashlib
+import json
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import metrics
+from ciphers import validate_text
+from mapped import map_file
+from streaming import make_stream, replaced_on_success
+
+DIRECTORY_CIPHERS = ("caesar-encrypt", "caesar-decrypt", "vigenere-encrypt", "vigenere-decrypt")
+# the default manifest is named after the cipher and key, so encrypting and decrypting the same tree keep apart
+MANIFEST_PREFIX = ".cryptor-manifest"
+# decrypting in place turns name + suffix back into name + DECRYPT_SUFFIX, never overwriting the original name
+DECRYPT_SUFFIX = ".dec"
+
+# small files are sent to the workers in groups of up to this many files or bytes, big ones alone
+GROUP_FILES = 64
+GROUP_BYTES = 4 << 20
+
+# files up to this size are read whole; bigger ones go through the memory-mapped path
+READ_LIMIT = 16 << 20
+
+# the cipher and key of a worker process, compiled once by its initializer
+_worker_cipher = None
+
+
+def manifest_name(cipher, key):
+    return "{}-{}-{}.jsonl".format(MANIFEST_PREFIX, cipher, key_digest(cipher, key)[:12])
+
+
+def plan_directory(source, output=None, suffix=".enc", manifest=None, decrypt=False):
+    # (relative path, input, output, size, mtime) of every file to cipher, largest first;
+    # without an output directory the results are written next to the inputs: encrypting appends suffix to every
+    # file but the results of either, decrypting takes only the files ending in suffix and swaps it for DECRYPT_SUFFIX
+    source = os.path.abspath(source)
+    output = os.path.abspath(output) if output else None
+    # the temporary files cipher_one leaves behind when a run is killed: "<output>.<pid>.tmp"
+    temporary = re.compile(re.escape(suffix) + r"\.\d+\.tmp$")
+    plan = []
+    for directory, directories, files in os.walk(source):
+        if output is not None:
+            # never descend into the output tree when it lives inside the source
+            directories[:] = [name for name in directories if os.path.join(directory, name) != output]
+        for name in files:
+            path_to_file = os.path.join(directory, name)
+            if name.startswith(MANIFEST_PREFIX) and name.endswith(".jsonl") or path_to_file == manifest:
+                continue
+            if output is None and (temporary.search(name) or name.endswith(suffix) != decrypt
+                                   or name.endswith(DECRYPT_SUFFIX)):
+                continue
+            relative = os.path.relpath(path_to_file, source)
+            if output is not None:
+                path_to_save = os.path.join(output, relative)
+            elif decrypt:
+                path_to_save = path_to_file[:-len(suffix)] + DECRYPT_SUFFIX
+            else:
+                path_to_save = path_to_file + suffix
+            stat = os.stat(path_to_file)
+            plan.append((relative, path_to_file, path_to_save, stat.st_size, stat.st_mtime_ns))
+    plan.sort(key=lambda entry: (-entry[3], entry[0]))
+    return plan
+
+
+def group_plan(plan, group_files=GROUP_FILES, group_bytes=GROUP_BYTES):
+    # consecutive files of the largest-first plan, so the biggest work is still handed out first
+    groups = []
+    group = []
+    size = 0
+    for entry in plan:
+        if group and (len(group) >= group_files or size + entry[3] > group_bytes):
+            groups.append(group)
+            group, size = [], 0
+        group.append(entry)
+        size += entry[3]
+    if group:
+        groups.append(group)
+    return groups
+
+
+def key_digest(cipher, key):
+    return hashlib.sha256("{}\0{}".format(cipher, key).encode('utf-8', 'surrogatepass')).hexdigest()
+
+
+def read_manifest(path_to_manifest, cipher, key):
+    # relative path -> (size, mtime) of every file a previous run finished
+    finished = dict()
+    try:
+        with open(path_to_manifest) as manifest:
+            lines = manifest.readlines()
+    except FileNotFoundError:
+        return finished
+    header = json.loads(lines[0]) if lines else {}
+    if header.get("key") != key_digest(cipher, key):
+        raise ValueError("Manifest {} belongs to another cipher or key".format(path_to_manifest))
+    for line in lines[1:]:
+        try:
+            entry = json.loads(line)
+        except ValueError:
+            # the last line of an interrupted run may be cut short
+            continue
+        finished[entry["path"]] = (entry["size"], entry["mtime"])
+    return finished
+
+
+def _init_worker(cipher, key, metrics_enabled=False):
+    global _worker_cipher
+    _worker_cipher = (cipher, key)
+    metrics.start_worker(metrics_enabled)
+    # fills the worker's cipher cache, so every file after that reuses the compiled key
+    make_stream(cipher, key)
+
+
+def cipher_one(cipher, key, path_to_file, path_to_save):
+    # written to a temporary file next to the output and renamed over it, so an output is whole or absent
+    os.makedirs(os.path.dirname(path_to_save), exist_ok=True)
+    if os.path.getsize(path_to_file) > READ_LIMIT:
+        map_file(path_to_file, path_to_save, cipher, key)
+        return
+    with replaced_on_success(path_to_save) as path_to_temp:
+        with metrics.stage("read") as timed:
+            with open(path_to_file, 'rb') as source:
+                data = source.read()
+            timed.bytes = len(data)
+        with metrics.stage("validate", len(data)):
+            validate_text(data)
+        with metrics.stage("cipher", len(data)):
+            answer = make_stream(cipher, key).transform(data)
+        with metrics.stage("write", len(answer)):
+            with open(path_to_temp, 'wb') as destination:
+                destination.write(answer)
+
+
+def cipher_group(group):
+    # runs in a worker: (relative path, error or None) for every file of the group, and the worker's stage totals
+    cipher, key = _worker_cipher
+    results = []
+    for relative, path_to_file, path_to_save, size, mtime in group:
+        try:
+            cipher_one(cipher, key, path_to_file, path_to_save)
+            results.append((relative, None))
+        except (OSError, ValueError) as error:
+            results.append((relative, str(error)))
+    return results, metrics.collect()
+
+
+def cipher_directory(source, cipher, key, output=None, suffix=".enc", workers=None, path_to_manifest=None,
+                     progress=None):
+    # returns (files done now, files skipped as already done, {relative path: error})
+    if cipher not in DIRECTORY_CIPHERS:
+        raise ValueError("Directories can only be ciphered with {}".format(", ".join(DIRECTORY_CIPHERS)))
+    make_stream(cipher, key)
+    if path_to_manifest is None:
+        path_to_manifest = os.path.join(output or source, manifest_name(cipher, key))
+    path_to_manifest = os.path.abspath(path_to_manifest)
+
+    finished = read_manifest(path_to_manifest, cipher, key)
+    plan = plan_directory(source, output, suffix, path_to_manifest, cipher.endswith("decrypt"))
+    remaining = [entry for entry in plan
+                 if finished.get(entry[0]) != (entry[3], entry[4]) or not os.path.exists(entry[2])]
+    by_path = {entry[0]: entry for entry in remaining}
+
+    done = 0
+    failed = dict()
+    os.makedirs(os.path.dirname(path_to_manifest), exist_ok=True)
+    with open(path_to_manifest, 'a') as manifest:
+        if manifest.tell() == 0:
+            manifest.write(json.dumps({"cipher": cipher, "key": key_digest(cipher, key)}) + "\n")
+        with ProcessPoolExecutor(max_workers=workers or os.cpu_count() or 1, initializer=_init_worker,
+                                 initargs=(cipher, key, metrics.enabled)) as executor:
+            futures = [executor.submit(cipher_group, group) for group in group_plan(remaining)]
+            for future in as_completed(futures):
+                results, stages = future.result()
+                metrics.merge(stages)
+                for relative, error in results:
+                    if error is not None:
+                        failed[relative] = error
+                        continue
+                    entry = by_path[relative]
+                    manifest.write(json.dumps({"path": relative, "size": entry[3], "mtime": entry[4]}) + "\n")
+                    done += 1
+                # flushed per group, so an interrupted run loses at most the groups in flight
+                manifest.flush()
+                if progress is not None:
+                    progress(done + len(failed), len(remaining))
+    return done, len(plan) - len(remaining), failed
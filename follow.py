@@ -0,0 +1,117 @@
+import json
+import os
+import time
+
+from ciphers import validate_text
+from directory import key_digest
+from keyfile import KeyFileWriter, KeyFileReader
+from streaming import CHUNK_SIZE, make_stream, check_distinct
+
+POLL_INTERVAL = 0.5
+
+# while catching up on a big backlog a checkpoint is still saved after at least this many bytes
+CHECKPOINT_BYTES = 64 << 20
+
+
+def read_checkpoint(path_to_checkpoint, cipher, key):
+    try:
+        with open(path_to_checkpoint) as checkpoint_file:
+            checkpoint = json.load(checkpoint_file)
+    except FileNotFoundError:
+        return None
+    if checkpoint.get("cipher") != cipher or checkpoint.get("key") != key_digest(cipher, key):
+        raise ValueError("Checkpoint {} belongs to another cipher or key".format(path_to_checkpoint))
+    return checkpoint
+
+
+def write_checkpoint(path_to_checkpoint, checkpoint):
+    with open(path_to_checkpoint + ".tmp", 'w') as checkpoint_file:
+        json.dump(checkpoint, checkpoint_file)
+    os.replace(path_to_checkpoint + ".tmp", path_to_checkpoint)
+
+
+class Follower:
+
+    def __init__(self, path_to_file, path_to_save, cipher, key, path_to_checkpoint, chunk_size=CHUNK_SIZE):
+        self.path_to_file = path_to_file
+        self.cipher = cipher
+        self.key = key
+        self.path_to_checkpoint = path_to_checkpoint
+        self.chunk_size = chunk_size
+
+        check_distinct(path_to_file, path_to_save, path_to_checkpoint, *([key] if cipher.startswith("vernam") else []))
+        checkpoint = read_checkpoint(path_to_checkpoint, cipher, key)
+        self.offset = checkpoint["offset"] if checkpoint else 0
+        key_position = checkpoint["key_position"] if checkpoint else 0
+
+        if checkpoint and not os.path.exists(path_to_save):
+            raise ValueError("Checkpoint {} is for an output that no longer exists".format(path_to_checkpoint))
+        # anything written after the checkpoint is cut off and redone, so a restart resumes exactly
+        self.output = open(path_to_save, 'r+b' if checkpoint else 'wb')
+        self.output.truncate(self.offset)
+        self.output.seek(self.offset)
+
+        self.key_file = None
+        if cipher == "vernam-encrypt":
+            self.key_file = KeyFileWriter(key, key_position if checkpoint else None,
+                                          checkpoint["key_checksum"] if checkpoint else 0)
+        elif cipher == "vernam-decrypt":
+            self.key_file = KeyFileReader(key, key_position)
+        # the Vigenere phase follows from the offset
+        self.stream = make_stream(cipher, key if self.key_file is None else self.key_file, self.offset)
+        self.saved = self.offset
+
+    def checkpoint(self):
+        self.output.flush()
+        checkpoint = {"cipher": self.cipher, "key": key_digest(self.cipher, self.key), "offset": self.offset,
+                      "key_position": self.offset}
+        if self.cipher.startswith("vigenere"):
+            checkpoint["phase"] = self.stream.offset
+        if self.cipher == "vernam-encrypt":
+            self.key_file.flush()
+            checkpoint["key_checksum"] = self.key_file.checksum
+        write_checkpoint(self.path_to_checkpoint, checkpoint)
+        self.saved = self.offset
+
+    def poll(self):
+        # ciphers whatever was appended since the last call and returns how many bytes that was
+        size = os.path.getsize(self.path_to_file)
+        if size < self.offset:
+            raise ValueError("{} shrank below the {} bytes already ciphered".format(self.path_to_file, self.offset))
+        start = self.offset
+        with open(self.path_to_file, 'rb') as source:
+            source.seek(self.offset)
+            while self.offset < size:
+                chunk = source.read(min(self.chunk_size, size - self.offset))
+                if not chunk:
+                    break
+                validate_text(chunk, self.offset)
+                self.output.write(self.stream.transform(chunk))
+                self.offset += len(chunk)
+                if self.offset - self.saved >= CHECKPOINT_BYTES:
+                    self.checkpoint()
+        if self.offset != self.saved or not os.path.exists(self.path_to_checkpoint):
+            self.checkpoint()
+        return self.offset - start
+
+    def close(self):
+        self.output.close()
+        if self.key_file is not None:
+            self.key_file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def follow_file(path_to_file, path_to_save, cipher, key, path_to_checkpoint, interval=POLL_INTERVAL, once=False,
+                chunk_size=CHUNK_SIZE, stop=None):
+    # tails the input until stop() is true (or after one pass with once); returns the offset reached
+    with Follower(path_to_file, path_to_save, cipher, key, path_to_checkpoint, chunk_size) as follower:
+        while True:
+            follower.poll()
+            if once or stop is not None and stop():
+                return follower.offset
+            time.sleep(interval)
@@ -0,0 +1,331 @@
+import collections
+import hashlib
+import json
+import math
+import os
+from dataclasses import dataclass
+
+import metrics
+from ciphers import alphabet, positions, encode_text, validate_text, InvalidSymbolError, NUMPY_THRESHOLD, load_numpy, \
+    caesar_decryption_bytes
+from streaming import CHUNK_SIZE, read_chunks
+
+STANDARD_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "standard.txt")
+PROFILE_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".profiles")
+
+# loaded language profiles by name
+_profiles = dict()
+
+
+class Histogram:
+
+    def __init__(self, counts=None):
+        self.counts = [0] * 256 if counts is None else list(counts)
+
+    def update(self, data):
+        numpy = load_numpy() if len(data) >= NUMPY_THRESHOLD else None
+        if numpy is not None:
+            counts = numpy.bincount(numpy.frombuffer(data, dtype=numpy.uint8), minlength=256).tolist()
+            for symbol in range(256):
+                self.counts[symbol] += counts[symbol]
+        else:
+            for symbol, count in collections.Counter(data).items():
+                self.counts[symbol] += count
+        return self
+
+    def merge(self, other):
+        return Histogram([a + b for a, b in zip(self.counts, other.counts)])
+
+    def __add__(self, other):
+        return self.merge(other)
+
+    def total(self):
+        return sum(self.counts)
+
+    def upper(self):
+        # the counts of text.upper(): lowercase letters are folded into uppercase ones
+        counts = list(self.counts)
+        for symbol in range(ord('a'), ord('z') + 1):
+            counts[ord(chr(symbol).upper())] += counts[symbol]
+            counts[symbol] = 0
+        return Histogram(counts)
+
+
+def build_histogram(data):
+    return Histogram().update(data)
+
+
+def histogram_file(path_to_file, chunk_size=CHUNK_SIZE):
+    histogram = Histogram()
+    with open(path_to_file, 'rb') as file:
+        for chunk in read_chunks(file, chunk_size):
+            histogram.update(chunk)
+    return histogram
+
+
+@dataclass(order=True)
+class LetterFrequency:
+    frequency: int
+    letter: str
+
+    def __init__(self, _letter, _text):
+        self.letter = _letter.upper()
+        self.frequency = _text.count(self.letter)
+
+    @classmethod
+    def from_count(cls, _letter, _count):
+        letter_frequency = cls.__new__(cls)
+        letter_frequency.letter = _letter.upper()
+        letter_frequency.frequency = _count
+        return letter_frequency
+
+
+def frequencies_from_histogram(histogram):
+    counts = histogram.upper().counts
+
+    frequencies = []
+    sum = 0
+    for i in range(len(alphabet)):
+        frequencies.append(LetterFrequency.from_count(alphabet[i], counts[positions[alphabet[i].upper()]]))
+        sum += frequencies[i].frequency
+    for i in range(len(frequencies)):
+        frequencies[i].frequency = frequencies[i].frequency / sum
+    frequencies.sort()
+    return frequencies
+
+
+def build_frequencies(text):
+    if isinstance(text, Histogram):
+        return frequencies_from_histogram(text)
+    if text.isascii():
+        data = text.encode('ascii')
+    else:
+        # non-ASCII symbols are never counted, but their uppercase forms may be ASCII
+        data = text.upper().encode('ascii', 'ignore')
+    return frequencies_from_histogram(build_histogram(data))
+
+
+class LanguageProfile:
+
+    def __init__(self, name, path, digest, histogram, stamp=None):
+        self.name = name
+        self.path = path
+        self.digest = digest
+        self.histogram = histogram
+        self.stamp = stamp
+        self.frequencies = frequencies_from_histogram(histogram)
+
+
+def file_digest(path_to_file):
+    digest = hashlib.sha256()
+    with open(path_to_file, 'rb') as file:
+        for chunk in read_chunks(file):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _file_stamp(path_to_file):
+    stat = os.stat(path_to_file)
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _profile_path(name, digest):
+    return os.path.join(PROFILE_DIRECTORY, "{}-{}.json".format(name, digest[:16]))
+
+
+def _read_profile(name, digest):
+    try:
+        with open(_profile_path(name, digest)) as profile_file:
+            saved = json.load(profile_file)
+    except (OSError, ValueError):
+        return None
+    if saved.get("sha256") != digest or len(saved.get("counts", ())) != 256:
+        return None
+    return Histogram(saved["counts"])
+
+
+def _write_profile(name, digest, histogram):
+    path_to_save = _profile_path(name, digest)
+    try:
+        os.makedirs(PROFILE_DIRECTORY, exist_ok=True)
+        with open(path_to_save + ".tmp", 'w') as profile_file:
+            json.dump({"name": name, "sha256": digest, "counts": histogram.counts}, profile_file)
+        os.replace(path_to_save + ".tmp", path_to_save)
+    except OSError:
+        # a read-only checkout still works, the profile is just recomputed next run
+        pass
+
+
+def load_profile(path_to_corpus=STANDARD_PATH, name=None):
+    path_to_corpus = os.path.abspath(path_to_corpus)
+    if name is None:
+        name = os.path.splitext(os.path.basename(path_to_corpus))[0]
+    stamp = _file_stamp(path_to_corpus)
+
+    profile = _profiles.get(name)
+    if profile is not None and profile.path == path_to_corpus and profile.stamp == stamp:
+        return profile
+
+    digest = file_digest(path_to_corpus)
+    if profile is not None and profile.path == path_to_corpus and profile.digest == digest:
+        profile.stamp = stamp
+        return profile
+
+    histogram = _read_profile(name, digest)
+    if histogram is None:
+        histogram = histogram_file(path_to_corpus)
+        _write_profile(name, digest, histogram)
+    profile = LanguageProfile(name, path_to_corpus, digest, histogram, stamp)
+    _profiles[name] = profile
+    return profile
+
+
+def get_profile(name):
+    return _profiles[name]
+
+
+@dataclass
+class ShiftScore:
+    shift: int
+    chi_squared: float
+    log_likelihood: float
+    confidence: float = 0.0
+
+
+@dataclass
+class CaesarCrack:
+    shift: int
+    confidence: float
+    ranking: list
+    text: object
+
+
+def as_profile(standard):
+    # the reference distribution from a LanguageProfile, a Histogram, a reference text or the default corpus
+    if standard is None:
+        return load_profile()
+    if isinstance(standard, LanguageProfile):
+        return standard
+    if not isinstance(standard, Histogram):
+        standard = build_histogram(standard.encode('ascii', 'ignore') if isinstance(standard, str) else standard)
+    return LanguageProfile(None, None, None, standard)
+
+
+def reference_probabilities(profile):
+    # add-one smoothing, so symbols missing from the corpus are unlikely rather than impossible
+    counts = profile.histogram.counts[:len(alphabet)]
+    total = sum(counts) + len(alphabet)
+    return [(count + 1) / total for count in counts]
+
+
+def score_shifts(histogram, probabilities):
+    # rotating the ciphertext histogram by a shift gives the histogram of that shift's plaintext
+    counts = histogram.counts[:len(alphabet)]
+    size = sum(counts)
+    expected = [size * probability for probability in probabilities]
+    log_probabilities = [math.log(probability) for probability in probabilities]
+
+    scores = []
+    for shift in range(len(alphabet)):
+        rotated = counts[shift:] + counts[:shift]
+        chi_squared = 0.0
+        if size:
+            chi_squared = sum((observed - e) ** 2 / e for observed, e in zip(rotated, expected))
+        log_likelihood = sum(observed * lp for observed, lp in zip(rotated, log_probabilities))
+        scores.append(ShiftScore(shift, chi_squared, log_likelihood))
+
+    # posterior of every shift under a uniform prior
+    best = max(score.log_likelihood for score in scores)
+    weights = [math.exp(score.log_likelihood - best) for score in scores]
+    total = sum(weights)
+    for score, weight in zip(scores, weights):
+        score.confidence = weight / total
+    return scores
+
+
+def rank_shifts(histogram, standard=None, method="chi-squared"):
+    scores = score_shifts(histogram, reference_probabilities(as_profile(standard)))
+    if method == "chi-squared":
+        scores.sort(key=lambda score: (score.chi_squared, score.shift))
+    elif method == "log-likelihood":
+        scores.sort(key=lambda score: (-score.log_likelihood, score.shift))
+    else:
+        raise ValueError("Unknown scoring method: {}".format(method))
+    return scores
+
+
+def crack_caesar(ciphertext, standard=None, method="chi-squared"):
+    data = encode_text(ciphertext) if isinstance(ciphertext, str) else ciphertext
+    with metrics.stage("histogram", len(data)):
+        histogram = build_histogram(data)
+    with metrics.stage("score"):
+        if method == "ngrams":
+            # imported here: the n-gram model is only loaded when asked for
+            from ngrams import load_model, rank_shifts_by_ngrams
+            ranking = rank_shifts_by_ngrams(data, standard if hasattr(standard, "score") else load_model())
+        else:
+            ranking = rank_shifts(histogram, standard, method)
+    best = ranking[0]
+    with metrics.stage("cipher", len(data)):
+        text = caesar_decryption_bytes(data, best.shift)
+    if isinstance(ciphertext, str):
+        text = text.decode('ascii')
+    return CaesarCrack(best.shift, best.confidence, ranking, text)
+
+
+def _shift_matrix(values):
+    # matrix[c, shift] = values[(c - shift) % 128]: a histogram times it scores every shift at once
+    numpy = load_numpy()
+    symbols = numpy.arange(len(alphabet))
+    return numpy.asarray(values, dtype=numpy.float64)[(symbols[:, None] - symbols[None, :]) % len(alphabet)]
+
+
+def crack_caesar_batch(ciphertexts, standard=None):
+    # crack_caesar for many messages at once: one histogram matrix (messages x 128) for all of them,
+    # scored against the profile with two matrix products; rankings are not kept
+    data = []
+    for index, text in enumerate(ciphertexts):
+        # every message is checked on its own, so the offset reported is within the message named
+        try:
+            data.append(validate_text(encode_text(text) if isinstance(text, str) else bytes(text)))
+        except InvalidSymbolError as error:
+            raise ValueError("Message {}: {}".format(index, error)) from None
+    probabilities = reference_probabilities(as_profile(standard))
+    numpy = load_numpy()
+    if numpy is None:
+        cracks = []
+        for message in data:
+            scores = score_shifts(build_histogram(message), probabilities)
+            best = min(scores, key=lambda score: (score.chi_squared, score.shift))
+            cracks.append(CaesarCrack(best.shift, best.confidence, None, caesar_decryption_bytes(message, best.shift)))
+    else:
+        joined = b"".join(data)
+        lengths = numpy.fromiter(map(len, data), dtype=numpy.int64, count=len(data))
+        messages = numpy.repeat(numpy.arange(len(data), dtype=numpy.int64), lengths)
+        symbols = numpy.frombuffer(joined, dtype=numpy.uint8).astype(numpy.int64)
+        histograms = numpy.bincount(messages * len(alphabet) + symbols, minlength=len(data) * len(alphabet))
+        histograms = histograms.reshape(len(data), len(alphabet)).astype(numpy.float64)
+
+        # chi-squared: sum((observed - n * p) ** 2 / (n * p)) = sum(observed ** 2 / p) / n - n
+        sizes = lengths.astype(numpy.float64)[:, None]
+        with numpy.errstate(divide='ignore', invalid='ignore'):
+            chi_squared = (histograms ** 2) @ _shift_matrix([1 / p for p in probabilities]) / sizes - sizes
+        chi_squared[lengths == 0] = 0.0
+        log_likelihood = histograms @ _shift_matrix([math.log(p) for p in probabilities])
+
+        shifts = numpy.argmin(chi_squared, axis=1)
+        # posterior of the chosen shift under a uniform prior, as in score_shifts
+        weights = numpy.exp(log_likelihood - log_likelihood.max(axis=1, keepdims=True))
+        confidences = weights[numpy.arange(len(data)), shifts] / weights.sum(axis=1)
+        cracks = [CaesarCrack(shift, confidence, None, caesar_decryption_bytes(message, shift))
+                  for shift, confidence, message in zip(shifts.tolist(), confidences.tolist(), data)]
+
+    for crack, text in zip(cracks, ciphertexts):
+        if isinstance(text, str):
+            crack.text = crack.text.decode('ascii')
+    return cracks
+
+
+def frequency_analysis(text_to_decrypt, standard_text):
+    # standard_text is the reference text itself or its LanguageProfile
+    return crack_caesar(text_to_decrypt, standard_text).text
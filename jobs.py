@@ -0,0 +1,150 @@
+import atexit
+import os
+import queue
+import tempfile
+import threading
+
+import metrics
+from ciphers import validate_text
+from mapped import map_file
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class Job:
+
+    def __init__(self, name, function, args):
+        self.name = name
+        self.function = function
+        self.args = args
+        self.state = "queued"
+        self.progress = 0.0
+        self.result = None
+        self.error = None
+        self._cancel = threading.Event()
+
+    def cancel(self):
+        self._cancel.set()
+
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    def report(self, done, total):
+        # called by the job itself between steps; this is where cancelling takes effect
+        self.progress = done / total if total else 1.0
+        if self._cancel.is_set():
+            raise JobCancelled()
+
+    def finished(self):
+        return self.state in ("done", "failed", "cancelled")
+
+
+class JobExecutor:
+
+    def __init__(self, workers=1):
+        self.queue = queue.Queue()
+        self.lock = threading.Lock()
+        self.jobs = []
+        self.threads = [threading.Thread(target=self._work, daemon=True) for i in range(workers)]
+        for thread in self.threads:
+            thread.start()
+
+    def submit(self, name, function, *args):
+        # function is called as function(job, *args) on a worker thread
+        job = Job(name, function, args)
+        with self.lock:
+            self.jobs.append(job)
+        self.queue.put(job)
+        return job
+
+    def pending(self):
+        with self.lock:
+            return list(self.jobs)
+
+    def shutdown(self):
+        for job in self.pending():
+            job.cancel()
+        for thread in self.threads:
+            self.queue.put(None)
+
+    def _work(self):
+        while True:
+            job = self.queue.get()
+            if job is None:
+                return
+            if job.cancelled():
+                job.state = "cancelled"
+            else:
+                self._run(job)
+            with self.lock:
+                self.jobs.remove(job)
+
+    def _run(self, job):
+        job.state = "running"
+        try:
+            # the cipher loops run here, on the worker thread, so that is where cProfile has to be switched on
+            with metrics.profiled(os.environ.get(metrics.PROFILE_VARIABLE)):
+                job.result = job.function(job, *job.args)
+            job.progress = 1.0
+            job.state = "done"
+        except JobCancelled:
+            job.state = "cancelled"
+        except Exception as error:
+            job.error = error
+            job.state = "failed"
+
+
+# results are written to temporary files that live until they are discarded or the program exits
+_result_files = []
+
+
+def result_file(suffix=".txt"):
+    descriptor, path_to_file = tempfile.mkstemp(prefix="cryptor-", suffix=suffix)
+    os.close(descriptor)
+    _result_files.append(path_to_file)
+    return path_to_file
+
+
+def discard_result_file(path_to_file):
+    if path_to_file in _result_files:
+        _result_files.remove(path_to_file)
+        try:
+            os.remove(path_to_file)
+        except OSError:
+            pass
+
+
+@atexit.register
+def discard_result_files():
+    for path_to_file in list(_result_files):
+        discard_result_file(path_to_file)
+
+
+def cipher_file(job, path_to_file, cipher, key=None):
+    # runs a cipher over a file window by window, reporting progress, into a result file and returns its path
+    # (and the path of the generated key-file for Vernam encryption)
+    size = os.path.getsize(path_to_file)
+    path_to_save = result_file()
+    path_to_key = None
+    try:
+        progress = lambda done: job.report(done, size)
+        if cipher == "frequency-analysis":
+            # imported here: the frequency module (and its profile) is not needed until the first analysis
+            from frequency import frequency_analysis, load_profile
+            job.report(0, size)
+            profile = load_profile(key) if key else load_profile()
+            with open(path_to_file, 'rb') as source, open(path_to_save, 'wb') as destination:
+                destination.write(frequency_analysis(validate_text(source.read()), profile))
+            return path_to_save
+        if cipher == "vernam-encrypt":
+            path_to_key = result_file(".key")
+            map_file(path_to_file, path_to_save, cipher, path_to_key, progress=progress)
+            return [path_to_save, path_to_key]
+        map_file(path_to_file, path_to_save, cipher, key, progress=progress)
+        return path_to_save
+    except BaseException:
+        discard_result_file(path_to_save)
+        discard_result_file(path_to_key)
+        raise
@@ -0,0 +1,200 @@
+import itertools
+import os
+import struct
+import zlib
+
+import metrics
+from ciphers import alphabet, cipher_cache
+
+# binary key-file: magic, version, number of keys, CRC32 of the keys, then one byte per key
+KEY_FILE_MAGIC = b"CPVK"
+KEY_FILE_VERSION = 1
+_header = struct.Struct("<4sBQI")
+HEADER_SIZE = _header.size
+
+
+def pack_header(length, checksum):
+    return _header.pack(KEY_FILE_MAGIC, KEY_FILE_VERSION, length, checksum)
+
+
+def unpack_header(data):
+    magic, version, length, checksum = _header.unpack_from(data)
+    if magic != KEY_FILE_MAGIC:
+        raise ValueError("Not a binary key-file")
+    if version != KEY_FILE_VERSION:
+        raise ValueError("Unsupported key-file version: {}".format(version))
+    return length, checksum
+
+
+def is_binary_key_file(path_to_key):
+    with open(path_to_key, 'rb') as key_file:
+        return key_file.read(len(KEY_FILE_MAGIC)) == KEY_FILE_MAGIC
+
+
+class KeyFileWriter:
+
+    def __init__(self, path_to_save, length=None, checksum=0):
+        # with length (and the checksum of those keys) an existing key-file is continued after its first length keys
+        self.length = 0 if length is None else length
+        self.checksum = checksum
+        if length is None:
+            self.file = open(path_to_save, 'wb')
+            self.file.write(pack_header(0, 0))
+        else:
+            self.file = open(path_to_save, 'r+b')
+            self.file.truncate(HEADER_SIZE + length)
+            self.file.seek(HEADER_SIZE + length)
+
+    def write(self, keys):
+        self.file.write(keys)
+        self.length += len(keys)
+        self.checksum = zlib.crc32(keys, self.checksum)
+
+    def flush(self):
+        # makes the key-file valid as it stands, with the header counting every key written so far
+        self.file.seek(0)
+        self.file.write(pack_header(self.length, self.checksum))
+        self.file.seek(HEADER_SIZE + self.length)
+        self.file.flush()
+
+    def close(self):
+        if self.file.closed:
+            return
+        self.file.seek(0)
+        self.file.write(pack_header(self.length, self.checksum))
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class KeyFileReader:
+
+    def __init__(self, path_to_key, start=0, position=None):
+        # position is the byte offset of key number start, if the caller already knows it
+        self.binary = is_binary_key_file(path_to_key)
+        if self.binary:
+            self.file = open(path_to_key, 'rb')
+            self.length, self.checksum = unpack_header(self.file.read(HEADER_SIZE))
+            self.file.seek(HEADER_SIZE + start)
+        else:
+            if position is None:
+                position = legacy_key_offsets(path_to_key, [start])[start] if start else 0
+            self.file = open(path_to_key, 'rb')
+            self.file.seek(position)
+
+    def read(self, count):
+        if self.binary:
+            return self.file.read(count)
+        with metrics.stage("key-parse", count):
+            return bytes([int(line) % len(alphabet) for line in itertools.islice(self.file, count)])
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def save_keys(path_to_save, keys):
+    with KeyFileWriter(path_to_save) as key_file:
+        key_file.write(bytes(keys))
+
+
+def load_keys(path_to_key):
+    # key arrays are cached until the key-file changes
+    stat = os.stat(path_to_key)
+    return cipher_cache.get(("vernam", os.path.abspath(path_to_key), stat.st_mtime_ns, stat.st_size),
+                            lambda: _read_keys(path_to_key))
+
+
+def _read_keys(path_to_key):
+    with open(path_to_key, 'rb') as key_file:
+        data = key_file.read()
+
+    if data[:len(KEY_FILE_MAGIC)] != KEY_FILE_MAGIC:
+        # legacy text key-file: one decimal key per line
+        return bytes([int(line) % len(alphabet) for line in data.split(b'\n') if line.strip()])
+
+    length, checksum = unpack_header(data)
+    keys = memoryview(data)[HEADER_SIZE:]
+    if len(keys) != length or zlib.crc32(keys) != checksum:
+        raise ValueError("Key-file is damaged")
+    return keys
+
+
+class KeyArrayReader:
+
+    # KeyFileReader over keys already in memory, as returned by load_keys
+    def __init__(self, keys, start=0):
+        self.keys = keys
+        self.position = start
+
+    def read(self, count):
+        keys = self.keys[self.position:self.position + count]
+        self.position += len(keys)
+        return keys
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def open_keys(path_to_key, start=0):
+    # key-files small enough for the cache are read, parsed and checked once and then served from it on
+    # repeat runs; bigger ones are read as they are used
+    if os.path.getsize(path_to_key) <= cipher_cache.max_bytes:
+        return KeyArrayReader(load_keys(path_to_key), start)
+    return KeyFileReader(path_to_key, start)
+
+
+def seal_key_file(path_to_key, length):
+    # writes the header of a key-file whose keys were filled in out of order
+    checksum = 0
+    with open(path_to_key, 'r+b') as key_file:
+        key_file.seek(HEADER_SIZE)
+        while True:
+            keys = key_file.read(1 << 20)
+            if not keys:
+                break
+            checksum = zlib.crc32(keys, checksum)
+        key_file.seek(0)
+        key_file.write(pack_header(length, checksum))
+
+
+def legacy_key_offsets(path_to_key, starts):
+    # byte offset of the line holding each requested key index in a one-key-per-line file
+    wanted = sorted(set(starts))
+    offsets = dict()
+    lines = 0
+    position = 0
+    with open(path_to_key, 'rb') as key_file:
+        # small reads keep the newline-by-newline walk to a target short
+        while wanted:
+            chunk = key_file.read(1 << 16)
+            if not chunk:
+                break
+            cursor = 0
+            remaining = chunk.count(b'\n')
+            while wanted and wanted[0] <= lines + remaining:
+                while wanted[0] > lines:
+                    cursor = chunk.index(b'\n', cursor) + 1
+                    lines += 1
+                    remaining -= 1
+                offsets[wanted.pop(0)] = position + cursor
+            lines += remaining
+            position += len(chunk)
+    if wanted:
+        raise ValueError("Key file has only {} keys".format(lines))
+    return offsets
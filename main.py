@@ -1,138 +1,14 @@
-import math
-import random
 from tkinter import *
-from dataclasses import dataclass
+from tkinter import ttk
 
-alphabet = [x.to_bytes(1, byteorder='big', signed=True).decode() for x in range(128)]
+from jobs import JobExecutor, cipher_file, discard_result_file
+from preview import Preview
 
-positions = dict()
-for pos in range(len(alphabet)):
-    positions[alphabet[pos]] = pos
 
-
-def check_text(text):
-    for symbol in text:
-        if symbol not in alphabet:
-            return False
-    return True
-
-
-def caesar_encryption(text_to_decrypt, shift):
-    def decrypt_letter(symbol_to_decrypt):
-        return alphabet[(positions[symbol_to_decrypt] + shift) % len(alphabet)]
-
-    answer = """"""
-    for symbol in text_to_decrypt:
-        answer += decrypt_letter(symbol)
-
-    return answer
-
-
-def caesar_decryption(text_to_encrypt, shift):
-    return caesar_encryption(text_to_encrypt, -shift)
-
-
-def vigenere_encryption(text_to_decrypt, keyword):
-    def decrypt_letter(symbol_to_decrypt, index):
-        shift = positions[keyword[index % len(keyword)]]
-        return alphabet[(positions[symbol_to_decrypt] + shift) % len(alphabet)]
-
-    answer = """"""
-    for i in range(len(text_to_decrypt)):
-        answer += decrypt_letter(text_to_decrypt[i], i)
-    return answer
-
-
-def vigenere_decryption(text_to_decrypt, keyword):
-    def decrypt_letter(symbol_to_decrypt, index):
-        shift = positions[keyword[index % len(keyword)]]
-        return alphabet[(positions[symbol_to_decrypt] - shift) % len(alphabet)]
-
-    answer = """"""
-    for i in range(len(text_to_decrypt)):
-        answer += decrypt_letter(text_to_decrypt[i], i)
-    return answer
-
-
-def vernam_encryption(text_to_decrypt):
-    def generate_sequence():
-        base = math.ceil(math.log(len(alphabet)))
-
-        def generate_chunk():
-            temp_chunk = 0
-            coefficient = 1
-            for j in range(base):
-                temp_chunk += random.randint(0, 1) * coefficient
-                coefficient *= 2
-            return temp_chunk
-
-        generate_keys = []
-        for k in range(len(text_to_decrypt)):
-            generate_keys.append(generate_chunk())
-        return generate_keys
-
-    keys = generate_sequence()
-
-    def decrypt_letter(symbol_to_decrypt, get_keys, index):
-        return alphabet[(positions[symbol_to_decrypt] ^ get_keys[index]) % len(alphabet)]
-
-    answer = """"""
-    for i in range(len(text_to_decrypt)):
-        answer += decrypt_letter(text_to_decrypt[i], keys, i)
-    return [answer, keys]
-
-
-def vernam_decryption(text_to_decrypt, keys):
-    def decrypt_letter(symbol_to_decrypt, get_keys, index):
-        return alphabet[(positions[symbol_to_decrypt] ^ get_keys[index]) % len(alphabet)]
-
-    answer = """"""
-    for i in range(len(text_to_decrypt)):
-        answer += decrypt_letter(text_to_decrypt[i], keys, i)
-    return answer
-
-
-@dataclass(order=True)
-class LetterFrequency:
-    frequency: int
-    letter: str
-
-    def __init__(self, _letter, _text):
-        self.letter = _letter.upper()
-        self.frequency = _text.count(self.letter)
-
-
-def build_frequencies(text):
-    text = text.upper()
-
-    frequencies = []
-    sum = 0
-    for i in range(len(alphabet)):
-        frequencies.append(LetterFrequency(alphabet[i], text))
-        sum += frequencies[i].frequency
-    for i in range(len(frequencies)):
-        frequencies[i].frequency = frequencies[i].frequency / sum
-    frequencies.sort()
-    return frequencies
-
-
-def frequency_analysis(text_to_decrypt, standard_text):
-    standard_frequencies = build_frequencies(standard_text)
-
-    to_decrypt_frequencies = build_frequencies(text_to_decrypt)
-
-    to_decrypt_most_common = positions[to_decrypt_frequencies[-1].letter]
-    language_most_common = positions[standard_frequencies[-1].letter]
-    shift = abs(to_decrypt_most_common - language_most_common)
-
-    def decrypt_letter(symbol_to_decrypt):
-        return alphabet[(positions[symbol_to_decrypt] - shift) % len(alphabet)]
-
-    answer = """"""
-    for symbol in text_to_decrypt:
-        answer += decrypt_letter(symbol)
-
-    return answer
+def copy_file(path_to_file, path_to_save):
+    # shutil takes a while to import and is only needed once a result is saved
+    import shutil
+    shutil.copyfile(path_to_file, path_to_save)
 
 
 class Window(Tk):
@@ -141,25 +17,95 @@ class Window(Tk):
         self.title("CryptorPython")
         self.geometry("500x580")
 
-        container = Frame(self)
-        container.pack(side="top", fill="both", expand=True)
-        container.grid_rowconfigure(0, weight=1)
-        container.grid_columnconfigure(0, weight=1)
+        self.executor = JobExecutor()
+        self.job_panel = JobPanel(self, self.executor)
+        self.job_panel.pack(side="top", fill="x")
 
-        self.frames = {}
+        self.container = Frame(self)
+        self.container.pack(side="top", fill="both", expand=True)
+        self.container.grid_rowconfigure(0, weight=1)
+        self.container.grid_columnconfigure(0, weight=1)
+
+        # every frame is built the first time it is shown
+        self.pages = {}
         for F in (StartingWindow, CaesarEncryptionWindow, CaesarDecryptionWindow, VigenereEncryptionWindow,
                   VigenereDecryptionWindow, VernamEncryptionWindow, VernamDecryptionWindow, FrequencyAnalysisWindow):
-            page_name = F.__name__
-            frame = F(parent=container, controller=self)
-            self.frames[page_name] = frame
-            frame.grid(row=0, column=0, sticky="nsew")
+            self.pages[F.__name__] = F
+        self.frames = {}
 
         self.show_frame("StartingWindow")
 
     def show_frame(self, page_name):
-        frame = self.frames[page_name]
+        frame = self.frames.get(page_name)
+        if frame is None:
+            frame = self.pages[page_name](parent=self.container, controller=self)
+            self.frames[page_name] = frame
+            frame.grid(row=0, column=0, sticky="nsew")
         frame.tkraise()
 
+    def run_job(self, name, function, args, on_done, on_error=None):
+        job = self.executor.submit(name, function, *args)
+        self.job_panel.watch(job, on_done, on_error)
+
+
+class JobPanel(Frame):
+
+    def __init__(self, parent, executor):
+        Frame.__init__(self, parent)
+        self.executor = executor
+        self.watched = []
+        self.message = "No jobs"
+
+        self.label = Label(self, text=self.message, anchor=W)
+        self.label.pack(side=LEFT, fill=X, expand=True, padx=5)
+        self.button_cancel = Button(self, text="Cancel", state='disabled', command=self.cancel)
+        self.button_cancel.pack(side=RIGHT, padx=5)
+        self.progress = ttk.Progressbar(self, length=150, maximum=1.0)
+        self.progress.pack(side=RIGHT)
+
+        self.poll()
+
+    def watch(self, job, on_done, on_error):
+        self.watched.append((job, on_done, on_error))
+
+    def cancel(self):
+        # queued jobs are cancelled too; the executor drops them instead of starting them
+        for job, on_done, on_error in self.watched:
+            if not job.finished():
+                job.cancel()
+
+    def poll(self):
+        # jobs run on a worker thread; their results are handed to the windows here, on the Tk thread
+        for item in list(self.watched):
+            job, on_done, on_error = item
+            if not job.finished():
+                continue
+            self.watched.remove(item)
+            if job.state == "done":
+                self.message = "{}: done".format(job.name)
+                on_done(job.result)
+            elif job.state == "failed":
+                self.message = "{}: {}".format(job.name, job.error)
+                if on_error is not None:
+                    on_error(job.error)
+            else:
+                self.message = "{}: cancelled".format(job.name)
+
+        running = [job for job, on_done, on_error in self.watched if job.state == "running"]
+        queued = len(self.watched) - len(running)
+        if running:
+            text = "{}: {:.0%}".format(running[0].name, running[0].progress)
+            if queued:
+                text += " ({} queued)".format(queued)
+            self.progress.config(value=running[0].progress)
+            self.button_cancel.config(state='normal')
+        else:
+            text = "{} queued".format(queued) if queued else self.message
+            self.progress.config(value=0)
+            self.button_cancel.config(state='normal' if queued else 'disabled')
+        self.label.config(text=text)
+        self.after(100, self.poll)
+
 
 class StartingWindow(Frame):
 
@@ -195,12 +141,15 @@ class CaesarEncryptionWindow(Frame):
     def __init__(self, parent, controller):
         Frame.__init__(self, parent)
         self.controller = controller
+        self.path_to_file = None
+        self.entry_shift = None
+        self.preview = None
+        self.encrypted = None
+        self.shift = None
 
         def save_to_file(encrypted, entry_path_to_save):
-            path_to_save = entry_path_to_save.get()
-            file_to_save = open(path_to_save, 'w')
-            file_to_save.write(encrypted)
-            file_to_save.close()
+            if encrypted is not None:
+                copy_file(encrypted, entry_path_to_save.get())
 
         def save_key_to_file(key, entry_path_to_save):
             path_to_save = entry_path_to_save.get()
@@ -208,46 +157,47 @@ class CaesarEncryptionWindow(Frame):
             file_to_save.write(key)
             file_to_save.close()
 
-        def insert_keyword(path_to_file, entry_shift):
-            shift = int(entry_shift.get())
-            file = open(path_to_file)
-
-            to_encrypt = file.read()
-
-            encrypted = ""
-            if not check_text(to_encrypt):
-                encrypted = "Text contains wrong symbols!"
+        def insert_keyword():
+            shift = int(self.entry_shift.get())
+            controller.run_job("Caesar encryption", cipher_file, (self.path_to_file, "caesar-encrypt", shift),
+                               lambda encrypted: show_result(encrypted, shift),
+                               lambda error: show_result(None, shift, str(error)))
+
+        def show_result(encrypted, shift, message=""):
+            discard_result_file(self.encrypted)
+            self.encrypted = encrypted
+            self.shift = shift
+            if self.preview is None:
+                entry_path_encrypted = Entry(self, width=15)
+                entry_path_encrypted.place(anchor=CENTER, relx=0.17, rely=0.6)
+                button_save_encrypted = Button(self, text="Save text",
+                                               command=lambda: save_to_file(self.encrypted, entry_path_encrypted))
+                button_save_encrypted.place(anchor=E, relx=0.47, rely=0.6)
+
+                entry_path_key = Entry(self, width=15)
+                entry_path_key.place(anchor=CENTER, relx=0.67, rely=0.6)
+                button_save_key = Button(self, text="Save key",
+                                         command=lambda: save_key_to_file(str(self.shift), entry_path_key))
+                button_save_key.place(anchor=E, relx=0.97, rely=0.6)
+
+                self.preview = Preview(self, width=50, height=13)
+                self.preview.place(anchor=N, relx=0.5, rely=0.7)
+
+            if encrypted is None:
+                self.preview.show_message(message)
             else:
-                encrypted = caesar_encryption(to_encrypt, shift)
-
-            entry_path_encrypted = Entry(self, width=15)
-            entry_path_encrypted.place(anchor=CENTER, relx=0.17, rely=0.6)
-            button_save_encrypted = Button(self, text="Save text",
-                                           command=lambda: save_to_file(encrypted, entry_path_encrypted))
-            button_save_encrypted.place(anchor=E, relx=0.47, rely=0.6)
-
-            entry_path_key = Entry(self, width=15)
-            entry_path_key.place(anchor=CENTER, relx=0.67, rely=0.6)
-            button_save_key = Button(self, text="Save key",
-                                     command=lambda: save_key_to_file(str(shift), entry_path_key))
-            button_save_key.place(anchor=E, relx=0.97, rely=0.6)
-
-            text = Text(width=50, height=13)
-            text.insert(INSERT, encrypted)
-            text.configure(state='disabled')
-            scroll = Scrollbar(command=text.yview)
-            scroll.place(relx=0, rely=0.7, relheight=0.3)
-            text.place(anchor=N, relx=0.5, rely=0.7)
-            text.config(yscrollcommand=scroll.set)
+                self.preview.show_file(encrypted)
 
         def insert_path():
-            file_to_encrypt = entry_path.get()
+            self.path_to_file = entry_path.get()
+            if self.entry_shift is not None:
+                return
             label_shift = Label(self, text="Enter shift")
             label_shift.config(bd=20)
             label_shift.pack(side=TOP)
-            entry_shift = Entry(self, width=50)
-            entry_shift.pack(side=TOP)
-            button_shift = Button(self, text="Enter", command=lambda: insert_keyword(file_to_encrypt, entry_shift))
+            self.entry_shift = Entry(self, width=50)
+            self.entry_shift.pack(side=TOP)
+            button_shift = Button(self, text="Enter", command=insert_keyword)
             button_shift.pack(side=TOP)
 
         label_path = Label(self, text="Enter path to file")
@@ -264,63 +214,64 @@ class CaesarDecryptionWindow(Frame):
     def __init__(self, parent, controller):
         Frame.__init__(self, parent)
         self.controller = controller
+        self.path_to_file = None
+        self.entry_shift = None
+        self.preview = None
+        self.decrypted = None
 
-        def save_to_file(encrypted, entry_path_to_save):
-            path_to_save = entry_path_to_save.get()
-            file_to_save = open(path_to_save, 'w')
-            file_to_save.write(encrypted)
-            file_to_save.close()
+        def save_to_file(decrypted, entry_path_to_save):
+            if decrypted is not None:
+                copy_file(decrypted, entry_path_to_save.get())
 
-        def insert_keyword(path_to_file, entry_shift, entry_path_shift):
+        def insert_keyword(entry_shift, entry_path_shift):
 
             shift = 0
 
             if len(entry_shift.get()) != 0:
                 shift = int(entry_shift.get())
 
-            file = open(path_to_file)
-
             key_path_to_file = entry_path_shift.get()
             if len(key_path_to_file) != 0:
-                key_file = open(key_path_to_file)
-                shift = int(key_file.read())
-
-            to_decrypt = file.read()
-
-            decrypted = ""
-            if not check_text(to_decrypt):
-                decrypted = "Text contains wrong symbols!"
+                with open(key_path_to_file) as key_file:
+                    shift = int(key_file.read())
+
+            controller.run_job("Caesar decryption", cipher_file, (self.path_to_file, "caesar-decrypt", shift),
+                               show_result, lambda error: show_result(None, str(error)))
+
+        def show_result(decrypted, message=""):
+            discard_result_file(self.decrypted)
+            self.decrypted = decrypted
+            if self.preview is None:
+                entry_path_decrypted = Entry(self, width=40)
+                entry_path_decrypted.place(anchor=CENTER, relx=0.45, rely=0.6)
+                button_save_decrypted = Button(self, text="Save text",
+                                               command=lambda: save_to_file(self.decrypted, entry_path_decrypted))
+                button_save_decrypted.place(anchor=E, relx=0.97, rely=0.6)
+
+                self.preview = Preview(self, width=50, height=13)
+                self.preview.place(anchor=N, relx=0.5, rely=0.7)
+
+            if decrypted is None:
+                self.preview.show_message(message)
             else:
-                decrypted = caesar_decryption(to_decrypt, shift)
-
-            entry_path_decrypted = Entry(self, width=40)
-            entry_path_decrypted.place(anchor=CENTER, relx=0.45, rely=0.6)
-            button_save_decrypted = Button(self, text="Save text",
-                                           command=lambda: save_to_file(decrypted, entry_path_decrypted))
-            button_save_decrypted.place(anchor=E, relx=0.97, rely=0.6)
-
-            text = Text(width=50, height=13)
-            text.insert(INSERT, decrypted)
-            text.configure(state='disabled')
-            scroll = Scrollbar(command=text.yview)
-            scroll.place(relx=0, rely=0.7, relheight=0.3)
-            text.place(anchor=N, relx=0.5, rely=0.7)
-            text.config(yscrollcommand=scroll.set)
+                self.preview.show_file(decrypted)
 
         def insert_path():
-            file_to_decrypt = entry_path.get()
+            self.path_to_file = entry_path.get()
+            if self.entry_shift is not None:
+                return
             label_shift = Label(self, text="    Enter shift...         "
                                            "                                       ...or insert path to key-file")
             label_shift.config(bd=20)
             label_shift.pack(side=TOP)
-            entry_shift = Entry(self, width=12)
-            entry_shift.pack(side=LEFT, padx=15, anchor=N)
+            self.entry_shift = Entry(self, width=12)
+            self.entry_shift.pack(side=LEFT, padx=15, anchor=N)
             entry_path_shift = Entry(self, width=10)
             button_shift = Button(self, text="Enter",
-                                  command=lambda: insert_keyword(file_to_decrypt, entry_shift, entry_path_shift))
+                                  command=lambda: insert_keyword(self.entry_shift, entry_path_shift))
             button_shift.pack(side=LEFT, anchor=N)
             button_path_shift = Button(self, text="Enter",
-                                       command=lambda: insert_keyword(file_to_decrypt, entry_shift, entry_path_shift))
+                                       command=lambda: insert_keyword(self.entry_shift, entry_path_shift))
             button_path_shift.pack(side=RIGHT, padx=15, anchor=N)
             entry_path_shift.pack(side=RIGHT, anchor=N)
 
@@ -338,40 +289,35 @@ class FrequencyAnalysisWindow(Frame):
     def __init__(self, parent, controller):
         Frame.__init__(self, parent)
         self.controller = controller
+        self.preview = None
+        self.decrypted = None
 
-        def save_to_file(encrypted, entry_path_to_save):
-            path_to_save = entry_path_to_save.get()
-            file_to_save = open(path_to_save, 'w')
-            file_to_save.write(encrypted)
-            file_to_save.close()
+        def save_to_file(decrypted, entry_path_to_save):
+            if decrypted is not None:
+                copy_file(decrypted, entry_path_to_save.get())
 
         def insert_path():
             path_to_decrypt = entry_path.get()
-            file_to_decrypt = open(path_to_decrypt, 'r')
-            to_decrypt = file_to_decrypt.read()
-
-            decrypted = ""
-            if not check_text(to_decrypt):
-                decrypted = "Text contains wrong symbols!"
+            controller.run_job("Frequency analysis", cipher_file, (path_to_decrypt, "frequency-analysis"),
+                               show_result, lambda error: show_result(None, str(error)))
+
+        def show_result(decrypted, message=""):
+            discard_result_file(self.decrypted)
+            self.decrypted = decrypted
+            if self.preview is None:
+                entry_path_decrypted = Entry(self, width=40)
+                entry_path_decrypted.place(anchor=CENTER, relx=0.45, rely=0.3)
+                button_save_decrypted = Button(self, text="Save text",
+                                               command=lambda: save_to_file(self.decrypted, entry_path_decrypted))
+                button_save_decrypted.place(anchor=E, relx=0.97, rely=0.3)
+
+                self.preview = Preview(self, width=50, height=40)
+                self.preview.place(anchor=N, relx=0.5, rely=0.4)
+
+            if decrypted is None:
+                self.preview.show_message(message)
             else:
-                standard_file = open("standard.txt")
-                standard_text = standard_file.read()
-                decrypted = frequency_analysis(to_decrypt, standard_text)
-
-            entry_path_decrypted = Entry(self, width=40)
-            entry_path_decrypted.place(anchor=CENTER, relx=0.45, rely=0.3)
-            button_save_decrypted = Button(self, text="Save text",
-                                           command=lambda: save_to_file(decrypted, entry_path_decrypted))
-            button_save_decrypted.place(anchor=E, relx=0.97, rely=0.3)
-
-            text = Text(width=50, height=40)
-            text.insert(INSERT, decrypted)
-            text.configure(state='disabled')
-            scroll = Scrollbar(command=text.yview)
-            scroll.place(relx=0, rely=0.4, relheight=0.6)
-            text.place(anchor=N, relx=0.5, rely=0.4)
-            text.config(yscrollcommand=scroll.set)
-
+                self.preview.show_file(decrypted)
 
         label_path = Label(self, text="Enter path to file")
         label_path.config(bd=20)
@@ -387,12 +333,15 @@ class VigenereEncryptionWindow(Frame):
     def __init__(self, parent, controller):
         Frame.__init__(self, parent)
         self.controller = controller
+        self.path_to_file = None
+        self.entry_shift = None
+        self.preview = None
+        self.encrypted = None
+        self.keyword = None
 
         def save_to_file(encrypted, entry_path_to_save):
-            path_to_save = entry_path_to_save.get()
-            file_to_save = open(path_to_save, 'w')
-            file_to_save.write(encrypted)
-            file_to_save.close()
+            if encrypted is not None:
+                copy_file(encrypted, entry_path_to_save.get())
 
         def save_key_to_file(key, entry_path_to_save):
             path_to_save = entry_path_to_save.get()
@@ -400,46 +349,47 @@ class VigenereEncryptionWindow(Frame):
             file_to_save.write(key)
             file_to_save.close()
 
-        def insert_keyword(path_to_file, entry_shift):
-            keyword = entry_shift.get()
-            file = open(path_to_file)
-
-            to_encrypt = file.read()
-
-            encrypted = ""
-            if not check_text(to_encrypt):
-                encrypted = "Text contains wrong symbols!"
+        def insert_keyword():
+            keyword = self.entry_shift.get()
+            controller.run_job("Vigenere encryption", cipher_file, (self.path_to_file, "vigenere-encrypt", keyword),
+                               lambda encrypted: show_result(encrypted, keyword),
+                               lambda error: show_result(None, keyword, str(error)))
+
+        def show_result(encrypted, keyword, message=""):
+            discard_result_file(self.encrypted)
+            self.encrypted = encrypted
+            self.keyword = keyword
+            if self.preview is None:
+                entry_path_encrypted = Entry(self, width=15)
+                entry_path_encrypted.place(anchor=CENTER, relx=0.17, rely=0.6)
+                button_save_encrypted = Button(self, text="Save text",
+                                               command=lambda: save_to_file(self.encrypted, entry_path_encrypted))
+                button_save_encrypted.place(anchor=E, relx=0.47, rely=0.6)
+
+                entry_path_key = Entry(self, width=15)
+                entry_path_key.place(anchor=CENTER, relx=0.67, rely=0.6)
+                button_save_key = Button(self, text="Save key",
+                                         command=lambda: save_key_to_file(self.keyword, entry_path_key))
+                button_save_key.place(anchor=E, relx=0.97, rely=0.6)
+
+                self.preview = Preview(self, width=50, height=13)
+                self.preview.place(anchor=N, relx=0.5, rely=0.7)
+
+            if encrypted is None:
+                self.preview.show_message(message)
             else:
-                encrypted = vigenere_encryption(to_encrypt, keyword)
-
-            entry_path_encrypted = Entry(self, width=15)
-            entry_path_encrypted.place(anchor=CENTER, relx=0.17, rely=0.6)
-            button_save_encrypted = Button(self, text="Save text",
-                                           command=lambda: save_to_file(encrypted, entry_path_encrypted))
-            button_save_encrypted.place(anchor=E, relx=0.47, rely=0.6)
-
-            entry_path_key = Entry(self, width=15)
-            entry_path_key.place(anchor=CENTER, relx=0.67, rely=0.6)
-            button_save_key = Button(self, text="Save key",
-                                     command=lambda: save_key_to_file(keyword, entry_path_key))
-            button_save_key.place(anchor=E, relx=0.97, rely=0.6)
-
-            text = Text(width=50, height=13)
-            text.insert(INSERT, encrypted)
-            text.configure(state='disabled')
-            scroll = Scrollbar(command=text.yview)
-            scroll.place(relx=0, rely=0.7, relheight=0.3)
-            text.place(anchor=N, relx=0.5, rely=0.7)
-            text.config(yscrollcommand=scroll.set)
+                self.preview.show_file(encrypted)
 
         def insert_path():
-            file_to_encrypt = entry_path.get()
+            self.path_to_file = entry_path.get()
+            if self.entry_shift is not None:
+                return
             label_shift = Label(self, text="Enter keyword")
             label_shift.config(bd=20)
             label_shift.pack(side=TOP)
-            entry_shift = Entry(self, width=50)
-            entry_shift.pack(side=TOP)
-            button_shift = Button(self, text="Enter", command=lambda: insert_keyword(file_to_encrypt, entry_shift))
+            self.entry_shift = Entry(self, width=50)
+            self.entry_shift.pack(side=TOP)
+            button_shift = Button(self, text="Enter", command=insert_keyword)
             button_shift.pack(side=TOP)
 
         label_path = Label(self, text="Enter path to file")
@@ -456,63 +406,64 @@ class VigenereDecryptionWindow(Frame):
     def __init__(self, parent, controller):
         Frame.__init__(self, parent)
         self.controller = controller
+        self.path_to_file = None
+        self.entry_shift = None
+        self.preview = None
+        self.decrypted = None
 
-        def save_to_file(encrypted, entry_path_to_save):
-            path_to_save = entry_path_to_save.get()
-            file_to_save = open(path_to_save, 'w')
-            file_to_save.write(encrypted)
-            file_to_save.close()
+        def save_to_file(decrypted, entry_path_to_save):
+            if decrypted is not None:
+                copy_file(decrypted, entry_path_to_save.get())
 
-        def insert_keyword(path_to_file, entry_shift, entry_path_shift):
+        def insert_keyword(entry_shift, entry_path_shift):
 
             keyword = 0
 
             if len(entry_shift.get()) != 0:
                 keyword = entry_shift.get()
 
-            file = open(path_to_file)
-
             key_path_to_file = entry_path_shift.get()
             if len(key_path_to_file) != 0:
-                key_file = open(key_path_to_file)
-                keyword = key_file.read()
-
-            to_decrypt = file.read()
-
-            decrypted = ""
-            if not check_text(to_decrypt):
-                decrypted = "Text contains wrong symbols!"
+                with open(key_path_to_file) as key_file:
+                    keyword = key_file.read()
+
+            controller.run_job("Vigenere decryption", cipher_file, (self.path_to_file, "vigenere-decrypt", keyword),
+                               show_result, lambda error: show_result(None, str(error)))
+
+        def show_result(decrypted, message=""):
+            discard_result_file(self.decrypted)
+            self.decrypted = decrypted
+            if self.preview is None:
+                entry_path_decrypted = Entry(self, width=40)
+                entry_path_decrypted.place(anchor=CENTER, relx=0.45, rely=0.6)
+                button_save_decrypted = Button(self, text="Save text",
+                                               command=lambda: save_to_file(self.decrypted, entry_path_decrypted))
+                button_save_decrypted.place(anchor=E, relx=0.97, rely=0.6)
+
+                self.preview = Preview(self, width=50, height=13)
+                self.preview.place(anchor=N, relx=0.5, rely=0.7)
+
+            if decrypted is None:
+                self.preview.show_message(message)
             else:
-                decrypted = vigenere_decryption(to_decrypt, keyword)
-
-            entry_path_decrypted = Entry(self, width=40)
-            entry_path_decrypted.place(anchor=CENTER, relx=0.45, rely=0.6)
-            button_save_decrypted = Button(self, text="Save text",
-                                           command=lambda: save_to_file(decrypted, entry_path_decrypted))
-            button_save_decrypted.place(anchor=E, relx=0.97, rely=0.6)
-
-            text = Text(width=50, height=13)
-            text.insert(INSERT, decrypted)
-            text.configure(state='disabled')
-            scroll = Scrollbar(command=text.yview)
-            scroll.place(relx=0, rely=0.7, relheight=0.3)
-            text.place(anchor=N, relx=0.5, rely=0.7)
-            text.config(yscrollcommand=scroll.set)
+                self.preview.show_file(decrypted)
 
         def insert_path():
-            file_to_decrypt = entry_path.get()
+            self.path_to_file = entry_path.get()
+            if self.entry_shift is not None:
+                return
             label_shift = Label(self, text="    Enter keyword...         "
                                            "                                       ...or insert path to key-file")
             label_shift.config(bd=20)
             label_shift.pack(side=TOP)
-            entry_shift = Entry(self, width=12)
-            entry_shift.pack(side=LEFT, padx=15, anchor=N)
+            self.entry_shift = Entry(self, width=12)
+            self.entry_shift.pack(side=LEFT, padx=15, anchor=N)
             entry_path_shift = Entry(self, width=10)
             button_shift = Button(self, text="Enter",
-                                  command=lambda: insert_keyword(file_to_decrypt, entry_shift, entry_path_shift))
+                                  command=lambda: insert_keyword(self.entry_shift, entry_path_shift))
             button_shift.pack(side=LEFT, anchor=N)
             button_path_shift = Button(self, text="Enter",
-                                       command=lambda: insert_keyword(file_to_decrypt, entry_shift, entry_path_shift))
+                                       command=lambda: insert_keyword(self.entry_shift, entry_path_shift))
             button_path_shift.pack(side=RIGHT, padx=15, anchor=N)
             entry_path_shift.pack(side=RIGHT, anchor=N)
 
@@ -530,52 +481,46 @@ class VernamEncryptionWindow(Frame):
     def __init__(self, parent, controller):
         Frame.__init__(self, parent)
         self.controller = controller
+        self.preview = None
+        self.encrypted = None
+        self.keys = None
 
         def save_to_file(encrypted, entry_path_to_save):
-            path_to_save = entry_path_to_save.get()
-            file_to_save = open(path_to_save, 'w')
-            file_to_save.write(encrypted)
-            file_to_save.close()
+            if encrypted is not None:
+                copy_file(encrypted, entry_path_to_save.get())
 
         def save_key_to_file(key, entry_path_to_save):
-            path_to_save = entry_path_to_save.get()
-            file_to_save = open(path_to_save, 'w')
-            for shift in key:
-                file_to_save.write(str(shift))
-                file_to_save.write("\n")
-            file_to_save.close()
+            if key is not None:
+                copy_file(key, entry_path_to_save.get())
 
         def insert_path():
-            file = open(entry_path.get())
-
-            to_encrypt = file.read()
-
-            encrypted = ""
-            if not check_text(to_encrypt):
-                encrypted = "Text contains wrong symbols!"
+            controller.run_job("Vernam encryption", cipher_file, (entry_path.get(), "vernam-encrypt"),
+                               show_result, lambda error: show_result([None, None], str(error)))
+
+        def show_result(encrypted, message=""):
+            discard_result_file(self.encrypted)
+            discard_result_file(self.keys)
+            self.encrypted, self.keys = encrypted
+            if self.preview is None:
+                entry_path_encrypted = Entry(self, width=15)
+                entry_path_encrypted.place(anchor=CENTER, relx=0.17, rely=0.4)
+                button_save_encrypted = Button(self, text="Save text",
+                                               command=lambda: save_to_file(self.encrypted, entry_path_encrypted))
+                button_save_encrypted.place(anchor=E, relx=0.47, rely=0.4)
+
+                entry_path_key = Entry(self, width=15)
+                entry_path_key.place(anchor=CENTER, relx=0.67, rely=0.4)
+                button_save_key = Button(self, text="Save key",
+                                         command=lambda: save_key_to_file(self.keys, entry_path_key))
+                button_save_key.place(anchor=E, relx=0.97, rely=0.4)
+
+                self.preview = Preview(self, width=50, height=30)
+                self.preview.place(anchor=N, relx=0.5, rely=0.5)
+
+            if self.encrypted is None:
+                self.preview.show_message(message)
             else:
-                encrypted = vernam_encryption(to_encrypt)
-
-            entry_path_encrypted = Entry(self, width=15)
-            entry_path_encrypted.place(anchor=CENTER, relx=0.17, rely=0.4)
-            button_save_encrypted = Button(self, text="Save text",
-                                           command=lambda: save_to_file(encrypted[0], entry_path_encrypted))
-            button_save_encrypted.place(anchor=E, relx=0.47, rely=0.4)
-
-            keyword = encrypted[1]
-            entry_path_key = Entry(self, width=15)
-            entry_path_key.place(anchor=CENTER, relx=0.67, rely=0.4)
-            button_save_key = Button(self, text="Save key",
-                                     command=lambda: save_key_to_file(keyword, entry_path_key))
-            button_save_key.place(anchor=E, relx=0.97, rely=0.4)
-
-            text = Text(width=50, height=30)
-            text.insert(INSERT, encrypted[0])
-            text.configure(state='disabled')
-            scroll = Scrollbar(command=text.yview)
-            scroll.place(relx=0, rely=0.5, relheight=0.5)
-            text.place(anchor=N, relx=0.5, rely=0.5)
-            text.config(yscrollcommand=scroll.set)
+                self.preview.show_file(self.encrypted)
 
         label_path = Label(self, text="Enter path to file")
         label_path.config(bd=20)
@@ -591,58 +536,49 @@ class VernamDecryptionWindow(Frame):
     def __init__(self, parent, controller):
         Frame.__init__(self, parent)
         self.controller = controller
-
-        def save_to_file(encrypted, entry_path_to_save):
-            path_to_save = entry_path_to_save.get()
-            file_to_save = open(path_to_save, 'w')
-            file_to_save.write(encrypted)
-            file_to_save.close()
-
-        def insert_keyword(path_to_file, entry_path_shift):
-            file = open(path_to_file)
-
-            key_path_to_file = entry_path_shift.get()
-            key_file = open(key_path_to_file)
-            keyword = key_file.read()
-            keys = keyword.split('\n')
-
-            temp = []
-            for i in range(len(keys) - 1):
-                temp.append(int(keys[i]))
-
-            keys = temp
-
-            to_decrypt = file.read()
-
-            decrypted = ""
-            if not check_text(to_decrypt):
-                decrypted = "Text contains wrong symbols!"
+        self.path_to_file = None
+        self.entry_path_shift = None
+        self.preview = None
+        self.decrypted = None
+
+        def save_to_file(decrypted, entry_path_to_save):
+            if decrypted is not None:
+                copy_file(decrypted, entry_path_to_save.get())
+
+        def insert_keyword():
+            key_path_to_file = self.entry_path_shift.get()
+            controller.run_job("Vernam decryption", cipher_file,
+                               (self.path_to_file, "vernam-decrypt", key_path_to_file),
+                               show_result, lambda error: show_result(None, str(error)))
+
+        def show_result(decrypted, message=""):
+            discard_result_file(self.decrypted)
+            self.decrypted = decrypted
+            if self.preview is None:
+                entry_path_decrypted = Entry(self, width=40)
+                entry_path_decrypted.place(anchor=CENTER, relx=0.45, rely=0.6)
+                button_save_decrypted = Button(self, text="Save text",
+                                               command=lambda: save_to_file(self.decrypted, entry_path_decrypted))
+                button_save_decrypted.place(anchor=E, relx=0.97, rely=0.6)
+
+                self.preview = Preview(self, width=50, height=13)
+                self.preview.place(anchor=N, relx=0.5, rely=0.7)
+
+            if decrypted is None:
+                self.preview.show_message(message)
             else:
-                decrypted = vernam_decryption(to_decrypt, keys)
-
-            entry_path_decrypted = Entry(self, width=40)
-            entry_path_decrypted.place(anchor=CENTER, relx=0.45, rely=0.6)
-            button_save_decrypted = Button(self, text="Save text",
-                                           command=lambda: save_to_file(decrypted, entry_path_decrypted))
-            button_save_decrypted.place(anchor=E, relx=0.97, rely=0.6)
-
-            text = Text(width=50, height=13)
-            text.insert(INSERT, decrypted)
-            text.configure(state='disabled')
-            scroll = Scrollbar(command=text.yview)
-            scroll.place(relx=0, rely=0.7, relheight=0.3)
-            text.place(anchor=N, relx=0.5, rely=0.7)
-            text.config(yscrollcommand=scroll.set)
+                self.preview.show_file(decrypted)
 
         def insert_path():
-            file_to_decrypt = entry_path.get()
+            self.path_to_file = entry_path.get()
+            if self.entry_path_shift is not None:
+                return
             label_shift = Label(self, text="Insert path to key-file")
             label_shift.config(bd=20)
             label_shift.pack(side=TOP)
-            entry_path_shift = Entry(self, width=50)
-            entry_path_shift.pack(side=TOP)
-            button_path_shift = Button(self, text="Enter",
-                                       command=lambda: insert_keyword(file_to_decrypt, entry_path_shift))
+            self.entry_path_shift = Entry(self, width=50)
+            self.entry_path_shift.pack(side=TOP)
+            button_path_shift = Button(self, text="Enter", command=insert_keyword)
             button_path_shift.pack(side=TOP)
 
         label_path = Label(self, text="Enter path to file")
@@ -0,0 +1,108 @@
+import contextlib
+import mmap
+import os
+import zlib
+
+import metrics
+from ciphers import validate_text, cipher_cache
+from keyfile import HEADER_SIZE, KeyFileReader, pack_header, unpack_header, is_binary_key_file, save_keys, \
+    open_keys
+from streaming import make_stream, check_distinct, replaced_on_success
+
+# how much of the mapped input is transformed at a time
+WINDOW_SIZE = 16 << 20
+
+
+class MappedKeys:
+
+    # key sink / source over the keys of a memory-mapped binary key-file
+    def __init__(self, key_map):
+        self.keys = memoryview(key_map)[HEADER_SIZE:]
+        self.position = 0
+        self.checksum = 0
+
+    def write(self, keys):
+        self.keys[self.position:self.position + len(keys)] = keys
+        self.position += len(keys)
+        self.checksum = zlib.crc32(keys, self.checksum)
+
+    def read(self, count):
+        keys = self.keys[self.position:self.position + count]
+        self.position += len(keys)
+        return keys
+
+    def release(self):
+        self.keys.release()
+
+
+@contextlib.contextmanager
+def _mapped_keys(cipher, path_to_key, size):
+    if cipher == "vernam-encrypt":
+        with open(path_to_key, 'w+b') as key_file:
+            key_file.truncate(HEADER_SIZE + size)
+            with mmap.mmap(key_file.fileno(), 0) as key_map:
+                keys = MappedKeys(key_map)
+                try:
+                    yield keys
+                    key_map[:HEADER_SIZE] = pack_header(keys.position, keys.checksum)
+                finally:
+                    keys.release()
+    elif cipher == "vernam-decrypt" and os.path.getsize(path_to_key) <= cipher_cache.max_bytes:
+        # checked once, then served from the key cache
+        with open_keys(path_to_key) as keys:
+            yield keys
+    elif cipher == "vernam-decrypt" and is_binary_key_file(path_to_key):
+        with open(path_to_key, 'rb') as key_file:
+            with mmap.mmap(key_file.fileno(), 0, access=mmap.ACCESS_READ) as key_map:
+                length, checksum = unpack_header(key_map)
+                keys = MappedKeys(key_map)
+                try:
+                    if len(keys.keys) != length or zlib.crc32(keys.keys) != checksum:
+                        raise ValueError("Key-file is damaged")
+                    yield keys
+                finally:
+                    keys.release()
+    elif cipher == "vernam-decrypt":
+        with KeyFileReader(path_to_key) as keys:
+            yield keys
+    else:
+        yield None
+
+
+def map_file(path_to_file, path_to_save, cipher, key, window_size=WINDOW_SIZE, progress=None):
+    # file-to-file transform: the input is memory-mapped and every window is written straight into a
+    # preallocated, memory-mapped output, so neither file is ever held in memory as a whole
+    check_distinct(path_to_file, path_to_save, *([key] if cipher.startswith("vernam") else []))
+    # the output and a new key-file only replace the files at their paths once everything is written
+    with replaced_on_success(path_to_save) as path_to_temp, \
+            replaced_on_success(key) if cipher == "vernam-encrypt" else contextlib.nullcontext(key) as path_to_key:
+        return _map_file(path_to_file, path_to_temp, cipher, path_to_key, window_size, progress)
+
+
+def _map_file(path_to_file, path_to_save, cipher, key, window_size, progress):
+    size = os.path.getsize(path_to_file)
+    with open(path_to_file, 'rb') as source, open(path_to_save, 'w+b') as destination:
+        destination.truncate(size)
+        if size == 0:
+            # mmap refuses empty files
+            if cipher == "vernam-encrypt":
+                save_keys(key, b"")
+            return 0
+
+        with mmap.mmap(source.fileno(), 0, access=mmap.ACCESS_READ) as input_map, \
+                mmap.mmap(destination.fileno(), 0) as output_map, \
+                _mapped_keys(cipher, key, size) as keys:
+            stream = make_stream(cipher, key if keys is None else keys)
+            for start in range(0, size, window_size):
+                with metrics.stage("read") as timed:
+                    window = input_map[start:start + window_size]
+                    timed.bytes = len(window)
+                with metrics.stage("validate", len(window)):
+                    validate_text(window, start)
+                with metrics.stage("cipher", len(window)):
+                    answer = stream.transform(window)
+                with metrics.stage("write", len(answer)):
+                    output_map[start:start + len(answer)] = answer
+                if progress is not None:
+                    progress(start + len(window))
+    return size
@@ -0,0 +1,159 @@
+import atexit
+import contextlib
+import json
+import os
+import threading
+import time
+
+# CRYPTOR_METRICS=log.jsonl turns the instrumentation on and appends one JSON record per run to the file;
+# CRYPTOR_PROMETHEUS=metrics.prom also writes the totals in the Prometheus text format,
+# CRYPTOR_PROFILE=run.prof runs everything under cProfile
+METRICS_VARIABLE = "CRYPTOR_METRICS"
+PROMETHEUS_VARIABLE = "CRYPTOR_PROMETHEUS"
+PROFILE_VARIABLE = "CRYPTOR_PROFILE"
+
+enabled = False
+_stages = dict()
+_lock = threading.Lock()
+
+
+class Stage:
+
+    __slots__ = ("name", "bytes", "start")
+
+    def __init__(self, name, size):
+        self.name = name
+        self.bytes = size
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        record(self.name, time.perf_counter() - self.start, self.bytes)
+
+
+class NullStage:
+
+    # what stage() hands out while the instrumentation is off: entering and leaving it costs next to nothing
+    bytes = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+
+_null_stage = NullStage()
+
+
+def stage(name, size=0):
+    # with stage("read") as timed: chunk = source.read(); timed.bytes = len(chunk)
+    if not enabled:
+        return _null_stage
+    return Stage(name, size)
+
+
+def record(name, seconds, size=0):
+    with _lock:
+        totals = _stages.get(name)
+        if totals is None:
+            totals = _stages[name] = {"calls": 0, "seconds": 0.0, "bytes": 0}
+        totals["calls"] += 1
+        totals["seconds"] += seconds
+        totals["bytes"] += size
+
+
+def snapshot():
+    with _lock:
+        return {name: dict(totals) for name, totals in _stages.items()}
+
+
+def reset():
+    with _lock:
+        _stages.clear()
+
+
+def collect():
+    # the totals recorded since the last call: what a pool worker sends back with each result
+    with _lock:
+        stages = {name: dict(totals) for name, totals in _stages.items()}
+        _stages.clear()
+    return stages
+
+
+def merge(stages):
+    # adds the totals a worker sent back to this process's
+    with _lock:
+        for name, totals in stages.items():
+            mine = _stages.setdefault(name, {"calls": 0, "seconds": 0.0, "bytes": 0})
+            for field in ("calls", "seconds", "bytes"):
+                mine[field] += totals[field]
+
+
+def start_worker(parent_enabled):
+    # pool worker initializer: records only if the parent does, and leaves writing the totals to the parent
+    global enabled
+    enabled = parent_enabled
+    atexit.unregister(_dump_from_environment)
+    reset()
+
+
+def enable():
+    global enabled
+    enabled = True
+
+
+def write_json(path_to_log, **fields):
+    # appends one line per run, so a log file collects the runs to compare
+    entry = dict(fields, time=time.time(), pid=os.getpid(), stages=snapshot())
+    with open(path_to_log, 'a') as log:
+        log.write(json.dumps(entry) + "\n")
+
+
+def write_prometheus(path_to_save):
+    stages = snapshot()
+    lines = []
+    for metric, field, help_text in (("cryptor_stage_seconds_total", "seconds", "Time spent in the stage."),
+                                     ("cryptor_stage_bytes_total", "bytes", "Bytes handled by the stage."),
+                                     ("cryptor_stage_calls_total", "calls", "Times the stage ran.")):
+        lines.append("# HELP {} {}".format(metric, help_text))
+        lines.append("# TYPE {} counter".format(metric))
+        for name in sorted(stages):
+            lines.append('{}{{stage="{}"}} {}'.format(metric, name, stages[name][field]))
+    with open(path_to_save + ".tmp", 'w') as metrics_file:
+        metrics_file.write("\n".join(lines) + "\n")
+    os.replace(path_to_save + ".tmp", path_to_save)
+
+
+@contextlib.contextmanager
+def profiled(path_to_save):
+    # cProfile around the block, dumped for pstats / snakeviz; None profiles nothing
+    if path_to_save is None:
+        yield
+        return
+    import cProfile
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        profiler.dump_stats(path_to_save)
+
+
+def dump(path_to_log=None, path_to_prometheus=None, **fields):
+    if path_to_log:
+        write_json(path_to_log, **fields)
+    if path_to_prometheus:
+        write_prometheus(path_to_prometheus)
+
+
+def _dump_from_environment():
+    dump(os.environ.get(METRICS_VARIABLE), os.environ.get(PROMETHEUS_VARIABLE))
+
+
+if os.environ.get(METRICS_VARIABLE) or os.environ.get(PROMETHEUS_VARIABLE):
+    enable()
+    atexit.register(_dump_from_environment)
@@ -0,0 +1,197 @@
+import array
+import math
+import os
+import struct
+import sys
+
+from ciphers import alphabet, encode_text, load_numpy, caesar_decryption_bytes
+from frequency import STANDARD_PATH, PROFILE_DIRECTORY, ShiftScore, file_digest
+
+# n-grams of 7-bit symbols are packed into one index, symbol by symbol: a trigram is a dense table of
+# 128 ** 3 = 2M log-probabilities (8 MiB); quadgrams already take 128 ** 4 * 4 bytes = 1 GiB
+DEFAULT_ORDER = 3
+MAX_ORDER = 4
+SYMBOL_BITS = 7
+
+# magic, version, order, then 128 ** order little-endian float32 log-probabilities
+NGRAM_MAGIC = b"CPNG"
+NGRAM_VERSION = 1
+_header = struct.Struct("<4sBB2x")
+
+# Caesar shifts are scored on a prefix this long, which is plenty to tell them apart
+SHIFT_SAMPLE_SIZE = 1 << 14
+
+# texts at least this long are scored with numpy, shorter ones in a plain loop
+SCORE_NUMPY_SIZE = 96
+
+# loaded models by (corpus path, order)
+_models = dict()
+
+
+def pack_codes(data, order):
+    # numpy array with the packed index of every n-gram of data
+    numpy = load_numpy()
+    symbols = numpy.frombuffer(data, dtype=numpy.uint8).astype(numpy.int64) & (len(alphabet) - 1)
+    count = max(len(symbols) - order + 1, 0)
+    codes = numpy.zeros(count, dtype=numpy.int64)
+    for position in range(order):
+        codes <<= SYMBOL_BITS
+        codes |= symbols[position:position + count]
+    return codes
+
+
+class NgramModel:
+
+    def __init__(self, order, table):
+        # table: 128 ** order natural-log probabilities, an array('f') or a numpy float32 array / memmap
+        self.order = order
+        self.table = table
+        self.mask = (1 << (SYMBOL_BITS * order)) - 1
+        # short texts are scored symbol by symbol, where a plain memoryview indexes far faster than numpy
+        if isinstance(table, array.array) or sys.byteorder == "big":
+            self.values = memoryview(array.array('f', table))
+        else:
+            self.values = memoryview(table).cast('B').cast('f')
+
+    def score(self, text):
+        # sum of the log-probabilities of every n-gram of text: higher is more like the corpus
+        data = encode_text(text) if isinstance(text, str) else text
+        if len(data) < self.order:
+            return 0.0
+        numpy = load_numpy()
+        if len(data) >= SCORE_NUMPY_SIZE and numpy is not None:
+            return float(numpy.asarray(self.table)[pack_codes(data, self.order)].sum(dtype=numpy.float64))
+        table = self.values
+        mask = self.mask
+        code = 0
+        for symbol in data[:self.order - 1]:
+            code = (code << SYMBOL_BITS) | (symbol & 127)
+        total = 0.0
+        for symbol in data[self.order - 1:]:
+            code = ((code << SYMBOL_BITS) | (symbol & 127)) & mask
+            total += table[code]
+        return total
+
+    def score_caesar_shifts(self, data):
+        # the score of (a prefix of) data deciphered with each of the 128 shifts, all at once
+        data = data[:SHIFT_SAMPLE_SIZE]
+        numpy = load_numpy()
+        if numpy is None:
+            return [self.score(caesar_decryption_bytes(data, shift)) for shift in range(len(alphabet))]
+        symbols = numpy.frombuffer(data, dtype=numpy.uint8).astype(numpy.int64)
+        count = len(symbols) - self.order + 1
+        if count <= 0:
+            return [0.0] * len(alphabet)
+        shifted = (symbols[None, :] - numpy.arange(len(alphabet), dtype=numpy.int64)[:, None]) & (len(alphabet) - 1)
+        codes = numpy.zeros((len(alphabet), count), dtype=numpy.int64)
+        for position in range(self.order):
+            codes <<= SYMBOL_BITS
+            codes |= shifted[:, position:position + count]
+        return numpy.asarray(self.table)[codes].sum(axis=1, dtype=numpy.float64).tolist()
+
+    def save(self, path_to_save):
+        with open(path_to_save + ".tmp", 'wb') as model_file:
+            model_file.write(_header.pack(NGRAM_MAGIC, NGRAM_VERSION, self.order))
+            if isinstance(self.table, array.array):
+                table = array.array('f', self.table)
+                if sys.byteorder == "big":
+                    table.byteswap()
+                table.tofile(model_file)
+            else:
+                model_file.write(load_numpy().asarray(self.table, dtype='<f4').tobytes())
+        os.replace(path_to_save + ".tmp", path_to_save)
+
+
+def count_ngrams(data, order):
+    # dense counts of every packed n-gram
+    size = len(alphabet) ** order
+    numpy = load_numpy()
+    if numpy is not None:
+        return numpy.bincount(pack_codes(data, order), minlength=size)
+    counts = array.array('q', bytes(8 * size))
+    mask = (1 << (SYMBOL_BITS * order)) - 1
+    code = 0
+    for position, symbol in enumerate(data):
+        code = ((code << SYMBOL_BITS) | (symbol & 127)) & mask
+        if position >= order - 1:
+            counts[code] += 1
+    return counts
+
+
+def train_model(data, order=DEFAULT_ORDER):
+    if not 1 <= order <= MAX_ORDER:
+        raise ValueError("n-gram order must be from 1 to {}".format(MAX_ORDER))
+    counts = count_ngrams(data, order)
+    total = max(int(sum(counts)), 1)
+    # unseen n-grams get a floor well below anything seen once rather than minus infinity
+    floor = math.log(0.01 / total)
+    numpy = load_numpy()
+    if numpy is not None:
+        table = numpy.full(len(counts), floor, dtype=numpy.float32)
+        seen = counts > 0
+        table[seen] = numpy.log(counts[seen] / total)
+        return NgramModel(order, table)
+    table = array.array('f', [math.log(count / total) if count else floor for count in counts])
+    return NgramModel(order, table)
+
+
+def read_model(path_to_model):
+    # one read, or with numpy a read-only memory map
+    with open(path_to_model, 'rb') as model_file:
+        magic, version, order = _header.unpack(model_file.read(_header.size))
+        if magic != NGRAM_MAGIC or version != NGRAM_VERSION:
+            raise ValueError("Not an n-gram model: {}".format(path_to_model))
+        size = len(alphabet) ** order
+        numpy = load_numpy()
+        if numpy is not None:
+            table = numpy.memmap(path_to_model, dtype='<f4', mode='r', offset=_header.size, shape=(size,))
+        else:
+            table = array.array('f')
+            table.frombytes(model_file.read(4 * size))
+            if sys.byteorder == "big":
+                table.byteswap()
+            if len(table) != size:
+                raise ValueError("n-gram model is cut short: {}".format(path_to_model))
+    return NgramModel(order, table)
+
+
+def _model_path(name, order, digest):
+    return os.path.join(PROFILE_DIRECTORY, "{}-{}gram-{}.bin".format(name, order, digest[:16]))
+
+
+def load_model(path_to_corpus=STANDARD_PATH, order=DEFAULT_ORDER):
+    # trained once per corpus and order, then saved next to the language profiles
+    path_to_corpus = os.path.abspath(path_to_corpus)
+    stat = os.stat(path_to_corpus)
+    stamp = (stat.st_mtime_ns, stat.st_size)
+    model = _models.get((path_to_corpus, order))
+    if model is not None and model[0] == stamp:
+        return model[1]
+    digest = file_digest(path_to_corpus)
+
+    path_to_model = _model_path(os.path.splitext(os.path.basename(path_to_corpus))[0], order, digest)
+    try:
+        model = read_model(path_to_model)
+    except (OSError, ValueError):
+        with open(path_to_corpus, 'rb') as corpus:
+            model = train_model(corpus.read(), order)
+        try:
+            os.makedirs(PROFILE_DIRECTORY, exist_ok=True)
+            model.save(path_to_model)
+        except OSError:
+            pass
+    _models[path_to_corpus, order] = (stamp, model)
+    return model
+
+
+def rank_shifts_by_ngrams(data, model=None):
+    # Caesar shifts ranked by the n-gram score of their plaintext, best first; confidence is the posterior
+    model = model or load_model()
+    scores = model.score_caesar_shifts(data)
+    best = max(scores)
+    weights = [math.exp(score - best) for score in scores]
+    total = sum(weights)
+    ranking = [ShiftScore(shift, 0.0, score, weight / total)
+               for shift, (score, weight) in enumerate(zip(scores, weights))]
+    ranking.sort(key=lambda score: (-score.log_likelihood, score.shift))
+    return ranking
@@ -0,0 +1,105 @@
+import contextlib
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import metrics
+from ciphers import validate_text
+from keyfile import HEADER_SIZE, KeyFileReader, pack_header, is_binary_key_file, seal_key_file, legacy_key_offsets
+from streaming import CHUNK_SIZE, make_stream, check_distinct, replaced_on_success
+
+# shards smaller than this cost more to schedule than they save
+MIN_SHARD_SIZE = 4 << 20
+
+
+def plan_shards(size, workers, min_shard_size=MIN_SHARD_SIZE):
+    # a few shards per worker so a slow one does not hold up the whole file
+    shard_size = max(min_shard_size, -(-size // (workers * 4)))
+    return [(start, min(start + shard_size, size)) for start in range(0, size, shard_size)]
+
+
+def write_at(file_descriptor, data, position):
+    if hasattr(os, 'pwrite'):
+        while data:
+            written = os.pwrite(file_descriptor, data, position)
+            data, position = data[written:], position + written
+    else:
+        os.lseek(file_descriptor, position, os.SEEK_SET)
+        os.write(file_descriptor, data)
+
+
+def run_shard(path_to_file, path_to_save, cipher, key, start, end, key_position=None, chunk_size=CHUNK_SIZE):
+    key_file = None
+    if cipher == "vernam-encrypt":
+        # the key-file is preallocated, so every shard writes its keys in place
+        key_file = open(key, 'r+b')
+        key_file.seek(HEADER_SIZE + start)
+    elif cipher == "vernam-decrypt":
+        key_file = KeyFileReader(key, start, key_position)
+
+    stream = make_stream(cipher, key if key_file is None else key_file, start)
+    output = os.open(path_to_save, os.O_WRONLY)
+    try:
+        with open(path_to_file, 'rb') as source:
+            source.seek(start)
+            position = start
+            while position < end:
+                with metrics.stage("read") as timed:
+                    chunk = source.read(min(chunk_size, end - position))
+                    timed.bytes = len(chunk)
+                if not chunk:
+                    break
+                with metrics.stage("validate", len(chunk)):
+                    validate_text(chunk, position)
+                with metrics.stage("cipher", len(chunk)):
+                    answer = stream.transform(chunk)
+                with metrics.stage("write", len(answer)):
+                    write_at(output, answer, position)
+                position += len(chunk)
+    finally:
+        os.close(output)
+        if key_file is not None:
+            key_file.close()
+    # the worker's stage totals go back with the result, to be merged by the parent
+    return position - start, metrics.collect()
+
+
+def parallel_file(path_to_file, path_to_save, cipher, key, workers=None, chunk_size=CHUNK_SIZE,
+                  min_shard_size=MIN_SHARD_SIZE):
+    check_distinct(path_to_file, path_to_save, *([key] if cipher.startswith("vernam") else []))
+    with replaced_on_success(path_to_save) as path_to_temp, \
+            replaced_on_success(key) if cipher == "vernam-encrypt" else contextlib.nullcontext(key) as path_to_key:
+        return _parallel_file(path_to_file, path_to_temp, cipher, path_to_key, workers, chunk_size, min_shard_size)
+
+
+def _parallel_file(path_to_file, path_to_save, cipher, key, workers, chunk_size, min_shard_size):
+    workers = workers or os.cpu_count() or 1
+    size = os.path.getsize(path_to_file)
+    shards = plan_shards(size, workers, min_shard_size)
+
+    with open(path_to_save, 'wb') as destination:
+        destination.truncate(size)
+
+    key_positions = [None] * len(shards)
+    if cipher == "vernam-encrypt":
+        with open(key, 'wb') as key_file:
+            key_file.write(pack_header(0, 0))
+            key_file.truncate(HEADER_SIZE + size)
+    elif cipher == "vernam-decrypt" and not is_binary_key_file(key):
+        # legacy text keys have no fixed width: find every shard's first key in one scan
+        offsets = legacy_key_offsets(key, [start for start, end in shards])
+        key_positions = [offsets[start] for start, end in shards]
+
+    processed = 0
+    with ProcessPoolExecutor(max_workers=workers, initializer=metrics.start_worker,
+                             initargs=(metrics.enabled,)) as executor:
+        futures = [executor.submit(run_shard, path_to_file, path_to_save, cipher, key,
+                                   start, end, key_positions[index], chunk_size)
+                   for index, (start, end) in enumerate(shards)]
+        for future in futures:
+            count, stages = future.result()
+            processed += count
+            metrics.merge(stages)
+
+    if cipher == "vernam-encrypt":
+        seal_key_file(key, size)
+    return processed
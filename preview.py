@@ -0,0 +1,128 @@
+import mmap
+import os
+from tkinter import *
+
+import metrics
+
+# how far back to look for the start of a line when scrolling up
+LOOKBACK = 1 << 16
+
+
+class FileView:
+
+    def __init__(self, path_to_file):
+        self.file = open(path_to_file, 'rb')
+        self.size = os.fstat(self.file.fileno()).st_size
+        # mmap refuses empty files
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ) if self.size else b""
+
+    def close(self):
+        if self.size:
+            self.map.close()
+        self.file.close()
+
+    def rows_from(self, offset, count, width):
+        # up to count display rows starting at offset: a row ends at a newline or after width symbols
+        rows = []
+        while len(rows) < count and offset < self.size:
+            end = self.map.find(b'\n', offset, offset + width)
+            end = min(offset + width, self.size) if end == -1 else end + 1
+            rows.append((offset, self.map[offset:end]))
+            offset = end
+        return rows
+
+    def rows_before(self, offset, count, width):
+        # up to count display rows ending right before offset: each earlier line is rewrapped from its start,
+        # walking back line by line until there are enough rows or the file starts
+        rows = []
+        end = offset
+        while len(rows) < count and end > 0:
+            start = max(0, end - LOOKBACK)
+            line_start = self.map.rfind(b'\n', start, end - 1)
+            line_start = start if line_start == -1 else line_start + 1
+            line = []
+            position = line_start
+            while position < end:
+                line.extend(self.rows_from(position, 1, width))
+                position = line[-1][0] + len(line[-1][1])
+            rows[:0] = line
+            end = line_start
+        return rows[-count:]
+
+
+class Preview(Frame):
+
+    def __init__(self, parent, width=50, height=13):
+        Frame.__init__(self, parent)
+        self.width = width
+        self.height = height
+        self.view = None
+        self.offset = 0
+
+        self.text = Text(self, width=width, height=height, wrap='none')
+        self.scroll = Scrollbar(self, command=self.on_scroll)
+        self.scroll.pack(side=LEFT, fill=Y)
+        self.text.pack(side=LEFT, fill=BOTH, expand=True)
+        self.text.bind("<MouseWheel>", lambda event: self.scroll_rows(-1 if event.delta > 0 else 1) or "break")
+        self.text.bind("<Button-4>", lambda event: self.scroll_rows(-1) or "break")
+        self.text.bind("<Button-5>", lambda event: self.scroll_rows(1) or "break")
+        self.text.configure(state='disabled')
+
+    def show_file(self, path_to_file):
+        self.close()
+        self.view = FileView(path_to_file)
+        self.offset = 0
+        self.render()
+
+    def show_message(self, message):
+        self.close()
+        self._fill(message)
+        self.scroll.set(0, 1)
+
+    def close(self):
+        if self.view is not None:
+            self.view.close()
+            self.view = None
+
+    def render(self):
+        with metrics.stage("render") as timed:
+            rows = self.view.rows_from(self.offset, self.height, self.width)
+            lines = [row.rstrip(b'\n').decode('ascii', 'replace') for start, row in rows]
+            self._fill("\n".join(lines))
+            timed.bytes = sum(len(row) for start, row in rows)
+        end = rows[-1][0] + len(rows[-1][1]) if rows else self.offset
+        size = self.view.size or 1
+        self.scroll.set(self.offset / size, end / size)
+
+    def scroll_rows(self, count):
+        if self.view is None:
+            return
+        if count > 0:
+            rows = self.view.rows_from(self.offset, count + 1, self.width)
+            # never scroll the last row off the top
+            self.offset = rows[min(count, len(rows) - 1)][0] if rows else self.offset
+        elif count < 0:
+            rows = self.view.rows_before(self.offset, -count, self.width)
+            if rows:
+                self.offset = rows[0][0]
+        self.render()
+
+    def on_scroll(self, action, *args):
+        if self.view is None:
+            return
+        if action == "moveto":
+            target = int(float(args[0]) * self.view.size)
+            target = min(max(target, 0), self.view.size - 1)
+            # start at the beginning of the row holding the target
+            rows = self.view.rows_before(target + 1, 1, self.width) if target >= 0 else []
+            self.offset = rows[0][0] if rows else 0
+            self.render()
+        elif action == "scroll":
+            count = int(args[0])
+            self.scroll_rows(count * self.height if args[1] == "pages" else count)
+
+    def _fill(self, content):
+        self.text.configure(state='normal')
+        self.text.delete("1.0", END)
+        self.text.insert(INSERT, content)
+        self.text.configure(state='disabled')
@@ -0,0 +1,146 @@
+import contextlib
+import os
+
+import metrics
+from ciphers import validate_text, caesar_encryption_bytes, vigenere_key, vigenere_encryption_bytes, \
+    vigenere_decryption_bytes, VernamKeystream, vernam_bytes
+
+CHUNK_SIZE = 1 << 20
+
+STREAM_CIPHERS = ("caesar-encrypt", "caesar-decrypt", "vigenere-encrypt", "vigenere-decrypt",
+                  "vernam-encrypt", "vernam-decrypt")
+
+
+class CaesarStream:
+
+    def __init__(self, shift, decrypt=False):
+        self.shift = -shift if decrypt else shift
+
+    def transform(self, chunk):
+        return caesar_encryption_bytes(chunk, self.shift)
+
+
+class VigenereStream:
+
+    def __init__(self, keyword, decrypt=False, offset=0):
+        self.keyword = keyword
+        self.decrypt = decrypt
+        # compiling the keyword up front also rejects a bad one before any output is written
+        vigenere_key(keyword)
+        self.offset = offset % len(keyword)
+
+    def transform(self, chunk):
+        if self.decrypt:
+            answer = vigenere_decryption_bytes(chunk, self.keyword, self.offset)
+        else:
+            answer = vigenere_encryption_bytes(chunk, self.keyword, self.offset)
+        self.offset = (self.offset + len(chunk)) % len(self.keyword)
+        return answer
+
+
+class VernamEncryptionStream:
+
+    def __init__(self, key_file, offset=0, keystream=None):
+        self.key_file = key_file
+        self.offset = offset
+        self.keystream = keystream or VernamKeystream()
+
+    def transform(self, chunk):
+        with metrics.stage("key-generate", len(chunk)):
+            keys = self.keystream.generate(len(chunk))
+        with metrics.stage("key-write", len(keys)):
+            self.key_file.write(keys)
+        self.offset += len(chunk)
+        return vernam_bytes(chunk, keys)
+
+
+class VernamDecryptionStream:
+
+    def __init__(self, key_file, offset=0):
+        self.key_file = key_file
+        self.offset = offset
+
+    def transform(self, chunk):
+        with metrics.stage("key-read", len(chunk)):
+            keys = self.key_file.read(len(chunk))
+        if len(keys) < len(chunk):
+            raise ValueError("Key file ends at symbol {}".format(self.offset + len(keys)))
+        self.offset += len(chunk)
+        return vernam_bytes(chunk, keys)
+
+
+def make_stream(cipher, key, offset=0):
+    # key is the shift, the keyword or, for Vernam, a keyfile.KeyFileWriter / KeyFileReader
+    if cipher == "caesar-encrypt":
+        return CaesarStream(int(key))
+    if cipher == "caesar-decrypt":
+        return CaesarStream(int(key), decrypt=True)
+    if cipher == "vigenere-encrypt":
+        return VigenereStream(key, offset=offset)
+    if cipher == "vigenere-decrypt":
+        return VigenereStream(key, decrypt=True, offset=offset)
+    if cipher == "vernam-encrypt":
+        return VernamEncryptionStream(key, offset)
+    if cipher == "vernam-decrypt":
+        return VernamDecryptionStream(key, offset)
+    raise ValueError("Unknown cipher: {}".format(cipher))
+
+
+def check_distinct(*paths):
+    # the input, the output and the key-file must be different files: an output opened for writing is truncated
+    # before a single byte of the input or the keys is read, and two outputs would overwrite each other
+    for index, first in enumerate(paths):
+        for second in paths[index + 1:]:
+            if os.path.abspath(first) == os.path.abspath(second) or \
+                    os.path.exists(first) and os.path.exists(second) and os.path.samefile(first, second):
+                raise ValueError("{} and {} are the same file".format(first, second))
+
+
+@contextlib.contextmanager
+def replaced_on_success(path_to_save):
+    # with replaced_on_success(path) as path_to_temp: the result is written to a temporary file next to path and
+    # renamed over it only when the block succeeds, so a failed run leaves neither a half-written file nor a
+    # clobbered old one
+    path_to_temp = "{}.{}.tmp".format(path_to_save, os.getpid())
+    try:
+        yield path_to_temp
+        os.replace(path_to_temp, path_to_save)
+    except BaseException:
+        if os.path.exists(path_to_temp):
+            os.remove(path_to_temp)
+        raise
+
+
+def read_chunks(source, chunk_size=CHUNK_SIZE):
+    while True:
+        chunk = source.read(chunk_size)
+        if not chunk:
+            return
+        yield chunk
+
+
+def stream_cipher(source, destination, cipher, chunk_size=CHUNK_SIZE, progress=None):
+    processed = 0
+    while True:
+        with metrics.stage("read") as timed:
+            chunk = source.read(chunk_size)
+            timed.bytes = len(chunk)
+        if not chunk:
+            break
+        with metrics.stage("validate", len(chunk)):
+            validate_text(chunk, processed)
+        with metrics.stage("cipher", len(chunk)):
+            answer = cipher.transform(chunk)
+        with metrics.stage("write", len(answer)):
+            destination.write(answer)
+        processed += len(chunk)
+        if progress is not None:
+            progress(processed)
+    return processed
+
+
+def stream_file(path_to_file, path_to_save, cipher, chunk_size=CHUNK_SIZE):
+    check_distinct(path_to_file, path_to_save)
+    with replaced_on_success(path_to_save) as path_to_temp:
+        with open(path_to_file, 'rb') as source, open(path_to_temp, 'wb') as destination:
+            return stream_cipher(source, destination, cipher, chunk_size)
@@ -0,0 +1,50 @@
+import asyncio
+
+import pytest
+
+from asynchronous import AsyncCipher, cipher_file
+from ciphers import caesar_encryption, vigenere_encryption_bytes, InvalidSymbolError
+
+TEXT = b"".join(b"line %d of the text, with some words in it\n" % number for number in range(2000))
+
+
+def write(path, data):
+    with open(path, 'wb') as output:
+        output.write(data)
+    return str(path)
+
+
+def read(path):
+    with open(path, 'rb') as source:
+        return source.read()
+
+
+@pytest.mark.parametrize("inline_limit", [1 << 20, 0])
+def test_concurrent_runs(inline_limit):
+    # with inline_limit 0 every request goes through the executor
+    texts = [TEXT[number * 100:number * 100 + 500].decode('ascii') for number in range(50)]
+
+    async def run_all():
+        runner = AsyncCipher(max_concurrency=8, inline_limit=inline_limit)
+        encrypted = await asyncio.gather(*(runner.run("caesar-encrypt", text, 3) for text in texts))
+        vernam = await runner.run("vernam-encrypt", TEXT)
+        return encrypted, vernam, await runner.run("vernam-decrypt", vernam[0], vernam[1]), \
+            await runner.run("vigenere-encrypt", TEXT, "keyword")
+
+    encrypted, vernam, decrypted, vigenere = asyncio.run(run_all())
+    assert encrypted == [caesar_encryption(text, 3) for text in texts]
+    assert len(vernam[1]) == len(TEXT) and decrypted == TEXT
+    assert vigenere == vigenere_encryption_bytes(TEXT, "keyword")
+
+
+def test_invalid_text_is_refused():
+    with pytest.raises(InvalidSymbolError):
+        asyncio.run(AsyncCipher().run("caesar-encrypt", b"text \xff", 3))
+
+
+def test_cipher_file(tmp_path):
+    path_to_file = write(tmp_path / "text.txt", TEXT)
+    path_to_save = str(tmp_path / "encrypted.txt")
+    assert asyncio.run(cipher_file(path_to_file, path_to_save, "vigenere-encrypt", "keyword", chunk_size=1000)) == \
+        len(TEXT)
+    assert read(path_to_save) == vigenere_encryption_bytes(TEXT, "keyword")
@@ -0,0 +1,90 @@
+import pickle
+import threading
+
+import pytest
+
+import ciphers
+from benchmark import reference_caesar, reference_vigenere, reference_vernam
+from ciphers import alphabet, CipherCache, InvalidSymbolError, validate_text, encode_text, caesar_encryption, \
+    caesar_decryption, vigenere_encryption, vigenere_decryption, vigenere_shifts, vigenere_encryption_bytes, \
+    vernam_encryption, vernam_decryption, VernamKeystream
+
+# every symbol, in a short text and in one long enough for the NumPy paths
+TEXTS = ["".join(alphabet), "".join(alphabet) * 600]
+
+
+@pytest.mark.parametrize("text", TEXTS)
+def test_caesar_matches_the_reference(text):
+    for shift in (0, 3, 127, 200, -5):
+        assert caesar_encryption(text, shift) == reference_caesar(text, shift)
+        assert caesar_decryption(text, shift) == reference_caesar(text, -shift)
+
+
+@pytest.mark.parametrize("numpy", [True, False])
+@pytest.mark.parametrize("text", TEXTS)
+def test_vigenere_matches_the_reference(monkeypatch, text, numpy):
+    if numpy:
+        pytest.importorskip("numpy")
+    else:
+        monkeypatch.setattr(ciphers, "_numpy", None)
+    for keyword in ("k", "keyword", "Long keyword with spaces!"):
+        assert vigenere_encryption(text, keyword) == reference_vigenere(text, keyword)
+        assert vigenere_decryption(text, keyword) == reference_vigenere(text, keyword, -1)
+
+
+@pytest.mark.parametrize("numpy", [True, False])
+@pytest.mark.parametrize("text", TEXTS)
+def test_vernam_matches_the_reference(monkeypatch, text, numpy):
+    if numpy:
+        pytest.importorskip("numpy")
+    else:
+        monkeypatch.setattr(ciphers, "_numpy", None)
+    encrypted, keys = vernam_encryption(text)
+    assert len(keys) == len(text) and max(keys) < len(alphabet)
+    assert encrypted == reference_vernam(text, keys)
+    assert vernam_decryption(encrypted, keys) == text
+    assert vernam_decryption(text, list(keys)) == reference_vernam(text, keys)
+    # a seeded keystream gives the same keys every time
+    assert vernam_encryption(text, VernamKeystream(7)) == vernam_encryption(text, VernamKeystream(7))
+
+
+def test_invalid_symbol_offset():
+    with pytest.raises(InvalidSymbolError) as error:
+        validate_text(b"abc\xffdef\x80", 1000)
+    assert (error.value.offset, error.value.value) == (1003, 0xff)
+    with pytest.raises(InvalidSymbolError) as error:
+        encode_text("text with é")
+    assert (error.value.offset, error.value.value) == (10, ord("é"))
+    with pytest.raises(InvalidSymbolError) as error:
+        caesar_encryption("ok ключ", 3)
+    assert error.value.offset == 3
+
+
+def test_invalid_symbol_error_pickles():
+    error = pickle.loads(pickle.dumps(InvalidSymbolError(9000000, 0xff)))
+    assert isinstance(error, InvalidSymbolError)
+    assert (error.offset, error.value) == (9000000, 0xff)
+    assert str(error) == str(InvalidSymbolError(9000000, 0xff))
+
+
+def test_cipher_cache_size_under_threads():
+    cache = CipherCache(max_entries=4, max_bytes=6)
+
+    def work():
+        for number in range(5000):
+            cache.get(number % 8, lambda: b"x")
+
+    threads = [threading.Thread(target=work) for number in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert cache.size == sum(size for value, size in cache.entries.values())
+    assert len(cache.entries) <= 4
+
+
+def test_keyword_outside_the_alphabet():
+    with pytest.raises(ValueError):
+        vigenere_shifts("ключ")
+    with pytest.raises(ValueError):
+        vigenere_encryption_bytes(b"text", "é")
@@ -0,0 +1,94 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+from ciphers import generate_vernam_keys
+from container import ContainerWriter, ContainerReader, pack_container, read_container
+from keyfile import save_keys
+
+TEXT = b"".join(b"line %d of the text, with some words in it\n" % number for number in range(2000))
+
+
+def write(path, data):
+    with open(path, 'wb') as output:
+        output.write(data)
+    return str(path)
+
+
+def read(path):
+    with open(path, 'rb') as source:
+        return source.read()
+
+
+@pytest.mark.parametrize("cipher, key", [("caesar", 3), ("vigenere", "keyword"), ("vernam", None)])
+def test_container_range_reads(tmp_path, cipher, key):
+    key = str(tmp_path / "keys.key") if key is None else key
+    path_to_container = str(tmp_path / "text.cpc")
+    with open(write(tmp_path / "text.txt", TEXT), 'rb') as source:
+        assert pack_container(source, path_to_container, cipher, key, chunk_size=1000, read_size=777) == len(TEXT)
+    assert read_container(path_to_container, key) == TEXT
+    with ContainerReader(path_to_container, key) as container:
+        assert container.length == len(TEXT)
+        for start, end in ((0, 1), (999, 1001), (1500, 4321), (len(TEXT) - 5, len(TEXT) + 100), (50, 50)):
+            assert container.read(start, end) == TEXT[start:end]
+
+
+def test_container_rejects_the_wrong_key(tmp_path):
+    path_to_container = str(tmp_path / "text.cpc")
+    with ContainerWriter(path_to_container, "vigenere", "keyword") as container:
+        container.write(TEXT)
+    with pytest.raises(ValueError):
+        ContainerReader(path_to_container, "other")
+
+    path_to_key = str(tmp_path / "keys.key")
+    with ContainerWriter(path_to_container, "vernam", path_to_key) as container:
+        container.write(TEXT)
+    save_keys(str(tmp_path / "other.key"), generate_vernam_keys(len(TEXT)))
+    with pytest.raises(ValueError):
+        ContainerReader(path_to_container, str(tmp_path / "other.key"))
+
+
+def test_container_damage_is_detected(tmp_path):
+    path_to_container = str(tmp_path / "text.cpc")
+    with ContainerWriter(path_to_container, "caesar", 3, chunk_size=1000) as container:
+        container.write(TEXT)
+    data = bytearray(read(path_to_container))
+    data[5000] ^= 1
+    write(path_to_container, data)
+    with ContainerReader(path_to_container, 3) as container:
+        assert container.read(0, 100) == TEXT[:100]
+        with pytest.raises(ValueError):
+            container.read(0, len(TEXT))
+
+
+def test_unfinished_container_is_refused(tmp_path):
+    path_to_container = str(tmp_path / "text.cpc")
+    with pytest.raises(RuntimeError):
+        with ContainerWriter(path_to_container, "caesar", 3, chunk_size=1000) as container:
+            container.write(TEXT)
+            raise RuntimeError()
+    with pytest.raises(ValueError):
+        ContainerReader(path_to_container, 3)
+
+
+def test_container_refuses_to_write_over_its_input(tmp_path):
+    path_to_file = write(tmp_path / "text.txt", TEXT)
+    with pytest.raises(ValueError):
+        ContainerWriter(path_to_file, "vernam", path_to_file)
+
+    def cli(*arguments):
+        return subprocess.run([sys.executable, "cli.py"] + list(arguments), capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).returncode
+
+    assert cli("container-encrypt", "caesar", "3", "-i", path_to_file, "-o", path_to_file) == 1
+    assert read(path_to_file) == TEXT
+    path_to_container = str(tmp_path / "text.cpc")
+    path_to_key = str(tmp_path / "keys.key")
+    assert cli("container-encrypt", "vernam", path_to_key, "-i", path_to_file, "-o", path_to_container) == 0
+    container = read(path_to_container)
+    assert cli("container-decrypt", path_to_key, "-i", path_to_container, "-o", path_to_container) == 1
+    assert cli("container-decrypt", path_to_key, "-i", path_to_container, "-o", path_to_key) == 1
+    assert read(path_to_container) == container
+    assert read_container(path_to_container, path_to_key) == TEXT
@@ -0,0 +1,17 @@
+import pytest
+
+import ciphers
+from ciphers import vigenere_encryption_bytes
+from cracking import rank_key_lengths
+
+TEXT = b"".join(b"line %d of the text, with some words in it\n" % number for number in range(2000))
+
+
+def test_key_lengths_agree_with_and_without_numpy(monkeypatch):
+    pytest.importorskip("numpy")
+    data = vigenere_encryption_bytes(TEXT * 4, "lemonade")
+    shared = rank_key_lengths(data)
+    monkeypatch.setattr(ciphers, "_numpy", None)
+    separate = rank_key_lengths(data)
+    assert [score.length for score in shared] == [score.length for score in separate]
+    assert all(abs(a.coincidence - b.coincidence) < 1e-9 for a, b in zip(shared, separate))
@@ -0,0 +1,136 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+import metrics
+from ciphers import InvalidSymbolError
+from directory import cipher_directory, plan_directory
+from mapped import map_file
+from parallel import parallel_file
+from streaming import make_stream, stream_file
+
+TEXT = b"".join(b"line %d of the text, with some words in it\n" % number for number in range(2000))
+
+
+def write(path, data):
+    with open(path, 'wb') as output:
+        output.write(data)
+    return str(path)
+
+
+def read(path):
+    with open(path, 'rb') as source:
+        return source.read()
+
+
+def test_parallel_reports_the_invalid_symbol(tmp_path):
+    path_to_file = write(tmp_path / "bad.txt", TEXT * 5 + b"\xff" + TEXT)
+    with pytest.raises(InvalidSymbolError) as error:
+        parallel_file(path_to_file, str(tmp_path / "out.txt"), "vernam-encrypt", str(tmp_path / "keys.key"),
+                      workers=2, min_shard_size=1 << 16)
+    assert error.value.offset == len(TEXT) * 5
+
+
+def test_output_over_input_or_key_is_refused(tmp_path):
+    path_to_file = write(tmp_path / "text.txt", TEXT)
+    path_to_key = str(tmp_path / "keys.key")
+    map_file(path_to_file, str(tmp_path / "encrypted.txt"), "vernam-encrypt", path_to_key)
+    keys = read(path_to_key)
+    with pytest.raises(ValueError):
+        map_file(path_to_file, path_to_file, "caesar-encrypt", 3)
+    with pytest.raises(ValueError):
+        stream_file(path_to_file, str(tmp_path / "." / "text.txt"), make_stream("caesar-encrypt", 3))
+    with pytest.raises(ValueError):
+        map_file(path_to_file, str(tmp_path / "out.txt"), "vernam-encrypt", path_to_file)
+    with pytest.raises(ValueError):
+        map_file(path_to_file, str(tmp_path / "out.txt"), "vernam-encrypt", str(tmp_path / "out.txt"))
+    with pytest.raises(ValueError):
+        map_file(str(tmp_path / "encrypted.txt"), path_to_key, "vernam-decrypt", path_to_key)
+    with pytest.raises(ValueError):
+        parallel_file(str(tmp_path / "encrypted.txt"), path_to_key, "vernam-decrypt", path_to_key, workers=2)
+    assert read(path_to_file) == TEXT
+    assert read(path_to_key) == keys
+
+
+@pytest.mark.parametrize("run", [
+    lambda source, target, key: map_file(source, target, "vernam-encrypt", key, window_size=1 << 16),
+    lambda source, target, key: parallel_file(source, target, "vernam-encrypt", key, workers=2,
+                                              min_shard_size=1 << 16),
+])
+def test_failed_run_keeps_the_old_output(tmp_path, run):
+    path_to_file = write(tmp_path / "bad.txt", TEXT * 5 + b"\xff" + TEXT)
+    path_to_save = write(tmp_path / "out.txt", b"old output")
+    path_to_key = write(tmp_path / "keys.key", b"old keys")
+    with pytest.raises(InvalidSymbolError):
+        run(path_to_file, path_to_save, path_to_key)
+    assert read(path_to_save) == b"old output"
+    assert read(path_to_key) == b"old keys"
+    assert sorted(os.listdir(tmp_path)) == ["bad.txt", "keys.key", "out.txt"]
+
+
+def test_cli_does_not_load_subcommand_modules():
+    script = "import sys, cli; print(sorted(set(sys.modules) & {'directory', 'follow', 'container', 'cracking', " \
+             "'concurrent.futures.process', 'multiprocessing'}))"
+    result = subprocess.run([sys.executable, "-c", script], cwd=os.path.dirname(os.path.abspath(__file__)),
+                            capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == "[]"
+
+
+def test_directory_keeps_user_tmp_files(tmp_path):
+    write(tmp_path / "notes.tmp", b"notes")
+    write(tmp_path / "text.txt.enc.1234.tmp", b"left behind by a killed run")
+    write(tmp_path / "text.txt", b"text")
+    assert sorted(entry[0] for entry in plan_directory(str(tmp_path))) == ["notes.tmp", "text.txt"]
+
+
+def test_directory_round_trip_in_place(tmp_path):
+    write(tmp_path / "a.txt", TEXT)
+    os.makedirs(tmp_path / "nested")
+    write(tmp_path / "nested" / "b.txt", TEXT[:1000])
+    assert cipher_directory(str(tmp_path), "vigenere-encrypt", "Key", workers=2) == (2, 0, {})
+    assert cipher_directory(str(tmp_path), "vigenere-decrypt", "Key", workers=2) == (2, 0, {})
+    assert read(tmp_path / "a.txt.dec") == TEXT
+    assert read(tmp_path / "nested" / "b.txt.dec") == TEXT[:1000]
+    # both runs are finished, and neither takes the other's results as inputs
+    assert cipher_directory(str(tmp_path), "vigenere-encrypt", "Key", workers=2) == (0, 2, {})
+    assert cipher_directory(str(tmp_path), "vigenere-decrypt", "Key", workers=2) == (0, 2, {})
+
+
+def test_batch_carries_on_past_a_bad_keyword(tmp_path):
+    path_to_file = write(tmp_path / "text.txt", TEXT)
+    manifest = "{0},{1}/a.txt,vigenere-encrypt,ключ\n{0},{1}/b.txt,caesar-encrypt,3\n".format(path_to_file, tmp_path)
+    path_to_manifest = tmp_path / "manifest.csv"
+    path_to_manifest.write_text(manifest, encoding='utf-8')
+    result = subprocess.run([sys.executable, "cli.py", "batch", str(path_to_manifest)],
+                            cwd=os.path.dirname(os.path.abspath(__file__)), capture_output=True, text=True)
+    assert result.returncode == 1
+    assert "Traceback" not in result.stderr
+    assert os.path.exists(tmp_path / "b.txt")
+
+
+def test_preview_pages_back_over_short_lines(tmp_path):
+    preview = pytest.importorskip("preview")
+    view = preview.FileView(write(tmp_path / "text.txt", TEXT))
+    try:
+        offset = view.rows_from(0, 41, 50)[40][0]
+        rows = view.rows_before(offset, 13, 50)
+        assert len(rows) == 13
+        assert rows == view.rows_from(rows[0][0], 13, 50)
+        assert rows[-1][0] + len(rows[-1][1]) == offset
+    finally:
+        view.close()
+
+
+def test_parallel_runs_are_instrumented(tmp_path):
+    path_to_file = write(tmp_path / "text.txt", TEXT * 10)
+    enabled = metrics.enabled
+    metrics.enable()
+    metrics.reset()
+    try:
+        parallel_file(path_to_file, str(tmp_path / "out.txt"), "caesar-encrypt", 3, workers=2, min_shard_size=1 << 16)
+        assert metrics.snapshot()["cipher"]["bytes"] == len(TEXT) * 10
+    finally:
+        metrics.reset()
+        metrics.enabled = enabled
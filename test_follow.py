@@ -0,0 +1,73 @@
+import os
+
+import pytest
+
+from follow import Follower, follow_file, read_checkpoint
+from mapped import map_file
+
+TEXT = b"".join(b"line %d of the text, with some words in it\n" % number for number in range(2000))
+
+
+def write(path, data):
+    with open(path, 'wb') as output:
+        output.write(data)
+    return str(path)
+
+
+def read(path):
+    with open(path, 'rb') as source:
+        return source.read()
+
+
+def decrypt_file(tmp_path, path_to_file, cipher, key):
+    path_to_save = str(tmp_path / "decrypted.txt")
+    map_file(path_to_file, path_to_save, cipher, key)
+    return read(path_to_save)
+
+
+@pytest.mark.parametrize("cipher, key", [("caesar-encrypt", 3), ("vigenere-encrypt", "keyword"),
+                                         ("vernam-encrypt", None)])
+def test_follow_resumes_where_it_stopped(tmp_path, cipher, key):
+    key = str(tmp_path / "keys.key") if key is None else key
+    path_to_file = write(tmp_path / "log.txt", TEXT[:1001])
+    path_to_save = str(tmp_path / "log.enc")
+    path_to_checkpoint = str(tmp_path / "log.checkpoint")
+    assert follow_file(path_to_file, path_to_save, cipher, key, path_to_checkpoint, once=True, chunk_size=300) == 1001
+
+    with open(path_to_file, 'ab') as log:
+        log.write(TEXT[1001:5000])
+    # a crash after writing past the checkpoint: the extra output is cut off and redone
+    with open(path_to_save, 'ab') as output:
+        output.write(b"garbage")
+    with Follower(path_to_file, path_to_save, cipher, key, path_to_checkpoint, chunk_size=300) as follower:
+        assert follower.poll() == 3999
+    assert read_checkpoint(path_to_checkpoint, cipher, key)["offset"] == 5000
+
+    decrypt = cipher.replace("encrypt", "decrypt")
+    assert decrypt_file(tmp_path, path_to_save, decrypt, key) == TEXT[:5000]
+
+
+def test_follow_refuses_to_write_over_its_input(tmp_path):
+    path_to_file = write(tmp_path / "log.txt", TEXT)
+    path_to_key = write(tmp_path / "keys.key", b"keys")
+    for path_to_save, cipher, key, path_to_checkpoint in (
+            (path_to_file, "caesar-encrypt", 3, str(tmp_path / "log.checkpoint")),
+            (str(tmp_path / "log.enc"), "caesar-encrypt", 3, path_to_file),
+            (path_to_key, "vernam-decrypt", path_to_key, str(tmp_path / "log.checkpoint")),
+            (str(tmp_path / "log.enc"), "vernam-encrypt", str(tmp_path / "log.enc"), str(tmp_path / "log.checkpoint"))):
+        with pytest.raises(ValueError):
+            follow_file(path_to_file, path_to_save, cipher, key, path_to_checkpoint, once=True)
+    assert read(path_to_file) == TEXT
+    assert read(path_to_key) == b"keys"
+
+
+def test_follow_checkpoint_checks_key_and_output(tmp_path):
+    path_to_file = write(tmp_path / "log.txt", TEXT[:100])
+    path_to_save = str(tmp_path / "log.enc")
+    path_to_checkpoint = str(tmp_path / "log.checkpoint")
+    follow_file(path_to_file, path_to_save, "vigenere-encrypt", "keyword", path_to_checkpoint, once=True)
+    with pytest.raises(ValueError):
+        Follower(path_to_file, path_to_save, "vigenere-encrypt", "other", path_to_checkpoint)
+    os.remove(path_to_save)
+    with pytest.raises(ValueError):
+        Follower(path_to_file, path_to_save, "vigenere-encrypt", "keyword", path_to_checkpoint)
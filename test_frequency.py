@@ -0,0 +1,73 @@
+import random
+
+import pytest
+
+import ciphers
+from benchmark import reference_frequencies
+from ciphers import caesar_encryption
+from frequency import STANDARD_PATH, load_profile, build_frequencies, build_histogram, crack_caesar, crack_caesar_batch
+
+with open(STANDARD_PATH, 'rb') as standard:
+    STANDARD = standard.read().decode('ascii')
+
+
+def messages(count, seed=0):
+    generator = random.Random(seed)
+    answer = []
+    for number in range(count):
+        start = generator.randrange(len(STANDARD) - 400)
+        answer.append(caesar_encryption(STANDARD[start:start + generator.randrange(20, 400)], generator.randrange(128)))
+    return answer
+
+
+@pytest.mark.parametrize("text", ["The quick brown fox jumps over the lazy dog", "Straße, naïve ÿ and ſ", None])
+def test_frequencies_match_the_reference(text):
+    # non-ASCII symbols are never counted, but the ASCII uppercase forms of some of them are
+    text = STANDARD if text is None else text
+    expected = reference_frequencies(text)
+    assert [(f.frequency, f.letter) for f in build_frequencies(text)] == expected
+    if text.isascii():
+        histogram = build_histogram(text.encode('ascii'))
+        assert [(f.frequency, f.letter) for f in build_frequencies(histogram)] == expected
+
+
+@pytest.mark.parametrize("method", ["chi-squared", "log-likelihood"])
+def test_crack_caesar_recovers_every_shift(method):
+    profile = load_profile()
+    plaintext = STANDARD[1000:1300]
+    for shift in range(128):
+        crack = crack_caesar(caesar_encryption(plaintext, shift), profile, method)
+        assert (crack.shift, crack.text) == (shift, plaintext)
+        assert len(crack.ranking) == 128 and crack.ranking[0].shift == shift
+        assert 0.5 < crack.confidence <= 1.0
+    crack = crack_caesar(caesar_encryption(plaintext, 42).encode('ascii'), profile, method)
+    assert (crack.shift, crack.text) == (42, plaintext.encode('ascii'))
+    with pytest.raises(ValueError):
+        crack_caesar(plaintext, profile, "guesswork")
+
+
+@pytest.mark.parametrize("numpy", [True, False])
+def test_batch_cracks_like_one_at_a_time(monkeypatch, numpy):
+    if numpy:
+        pytest.importorskip("numpy")
+    else:
+        monkeypatch.setattr(ciphers, "_numpy", None)
+    profile = load_profile()
+    texts = messages(200) + [""]
+    texts[1] = texts[1].encode('ascii')
+    for crack, text in zip(crack_caesar_batch(texts, profile), texts):
+        single = crack_caesar(text, profile)
+        assert crack.shift == single.shift
+        assert crack.text == single.text
+        assert crack.confidence == pytest.approx(single.confidence)
+
+
+@pytest.mark.parametrize("numpy", [True, False])
+def test_batch_names_the_bad_message(monkeypatch, numpy):
+    if numpy:
+        pytest.importorskip("numpy")
+    else:
+        monkeypatch.setattr(ciphers, "_numpy", None)
+    for bad in (b"fine\xff", "fine\xe9"):
+        with pytest.raises(ValueError, match="Message 2: .* at offset 4"):
+            crack_caesar_batch(["one", b"two", bad, "four"])
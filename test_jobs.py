@@ -0,0 +1,19 @@
+import threading
+
+from jobs import JobExecutor
+
+
+def test_queued_job_is_cancelled_before_it_starts():
+    executor = JobExecutor()
+    release = threading.Event()
+    ran = []
+    first = executor.submit("first", lambda job: release.wait(5))
+    second = executor.submit("second", lambda job: ran.append(job))
+    second.cancel()
+    release.set()
+    for thread in executor.threads:
+        executor.queue.put(None)
+        thread.join(5)
+    assert first.state == "done"
+    assert second.state == "cancelled"
+    assert ran == []
@@ -0,0 +1,89 @@
+import zlib
+
+import pytest
+
+from ciphers import generate_vernam_keys
+from keyfile import HEADER_SIZE, KeyFileWriter, KeyFileReader, save_keys, load_keys, open_keys, legacy_key_offsets
+from mapped import map_file
+
+TEXT = b"".join(b"line %d of the text, with some words in it\n" % number for number in range(2000))
+
+
+def write(path, data):
+    with open(path, 'wb') as output:
+        output.write(data)
+    return str(path)
+
+
+def read(path):
+    with open(path, 'rb') as source:
+        return source.read()
+
+
+def decrypt_file(tmp_path, path_to_file, cipher, key):
+    path_to_save = str(tmp_path / "decrypted.txt")
+    map_file(path_to_file, path_to_save, cipher, key)
+    return read(path_to_save)
+
+
+def test_key_file_round_trip(tmp_path):
+    keys = generate_vernam_keys(10000)
+    path_to_key = str(tmp_path / "keys.key")
+    save_keys(path_to_key, keys)
+    data = read(path_to_key)
+    assert len(data) == HEADER_SIZE + len(keys)
+    assert bytes(load_keys(path_to_key)) == keys
+    with KeyFileReader(path_to_key, 1234) as reader:
+        assert reader.read(100) == keys[1234:1334]
+
+
+def test_key_file_damage_is_detected(tmp_path):
+    path_to_key = str(tmp_path / "keys.key")
+    save_keys(path_to_key, generate_vernam_keys(1000))
+    data = bytearray(read(path_to_key))
+    data[HEADER_SIZE + 10] ^= 1
+    write(path_to_key, data)
+    with pytest.raises(ValueError):
+        load_keys(path_to_key)
+    write(path_to_key, data[:-1])
+    with pytest.raises(ValueError):
+        load_keys(path_to_key)
+
+
+def test_key_file_writer_resumes(tmp_path):
+    keys = generate_vernam_keys(3000)
+    path_to_key = str(tmp_path / "keys.key")
+    with KeyFileWriter(path_to_key) as writer:
+        writer.write(keys[:1000])
+        writer.write(b"written after the checkpoint")
+    with KeyFileWriter(path_to_key, 1000, zlib.crc32(keys[:1000])) as writer:
+        writer.write(keys[1000:])
+    assert bytes(load_keys(path_to_key)) == keys
+
+
+def test_legacy_key_offsets(tmp_path):
+    keys = [number * 7 % 128 for number in range(5000)]
+    path_to_key = write(tmp_path / "keys.txt", b"".join(b"%d\n" % key for key in keys))
+    offsets = legacy_key_offsets(path_to_key, [0, 1, 999, 4999])
+    data = read(path_to_key)
+    for start, offset in offsets.items():
+        assert int(data[offset:data.index(b"\n", offset)]) == keys[start]
+    with KeyFileReader(path_to_key, 2500) as reader:
+        assert list(reader.read(10)) == keys[2500:2510]
+    with pytest.raises(ValueError):
+        legacy_key_offsets(path_to_key, [5001])
+
+
+def test_vernam_decrypts_with_legacy_and_cached_keys(tmp_path):
+    path_to_file = write(tmp_path / "text.txt", TEXT)
+    path_to_save = str(tmp_path / "encrypted.txt")
+    path_to_key = str(tmp_path / "keys.key")
+    map_file(path_to_file, path_to_save, "vernam-encrypt", path_to_key)
+    assert decrypt_file(tmp_path, path_to_save, "vernam-decrypt", path_to_key) == TEXT
+    # a repeat run is served from the key cache
+    assert decrypt_file(tmp_path, path_to_save, "vernam-decrypt", path_to_key) == TEXT
+    with open_keys(path_to_key, 5) as reader:
+        assert bytes(reader.read(3)) == bytes(load_keys(path_to_key)[5:8])
+
+    legacy_key = write(tmp_path / "keys.txt", b"".join(b"%d\n" % key for key in load_keys(path_to_key)))
+    assert decrypt_file(tmp_path, path_to_save, "vernam-decrypt", legacy_key) == TEXT
@@ -0,0 +1,33 @@
+import pytest
+
+import ciphers
+from ciphers import caesar_encryption_bytes
+from frequency import STANDARD_PATH
+from ngrams import SCORE_NUMPY_SIZE, train_model, rank_shifts_by_ngrams
+
+with open(STANDARD_PATH, 'rb') as standard:
+    STANDARD = standard.read()
+
+
+@pytest.mark.parametrize("order", [1, 3])
+def test_scores_agree_with_and_without_numpy(monkeypatch, order):
+    pytest.importorskip("numpy")
+    model = train_model(STANDARD, order)
+    texts = [STANDARD[:order - 1], STANDARD[500:500 + SCORE_NUMPY_SIZE - 1], STANDARD[500:500 + SCORE_NUMPY_SIZE],
+             STANDARD[2000:6000], caesar_encryption_bytes(STANDARD[2000:6000], 17)]
+    with_numpy = [model.score(text) for text in texts]
+    shifts_with_numpy = model.score_caesar_shifts(texts[3])
+    assert model.score(texts[3].decode('ascii')) == pytest.approx(with_numpy[3])
+    monkeypatch.setattr(ciphers, "_numpy", None)
+    assert [model.score(text) for text in texts] == pytest.approx(with_numpy)
+    assert model.score_caesar_shifts(texts[3]) == pytest.approx(shifts_with_numpy)
+    # a model trained without numpy scores the same
+    plain = train_model(STANDARD, order)
+    assert [plain.score(text) for text in texts] == pytest.approx(with_numpy)
+
+
+def test_ngrams_rank_the_right_shift_first():
+    model = train_model(STANDARD)
+    ranking = rank_shifts_by_ngrams(caesar_encryption_bytes(STANDARD[3000:3200], 77), model)
+    assert ranking[0].shift == 77
+    assert len(ranking) == 128 and ranking[0].confidence > 0.5